@@ -0,0 +1,164 @@
+# This script benchmarks the hot paths of both scripts reproducibly, writes the results as JSON, and compares them against a saved baseline.
+import argparse # This line imports the argparse package for reading the command line options.
+import contextlib # This line imports the contextlib package for hiding printed messages while timing.
+import json # This line imports the json package for writing and reading results.
+import os # This line imports the os package for discarding printed messages.
+import platform # This line imports the platform package for recording the machine the results came from.
+import random # This line imports the random package for generating the benchmark data from fixed seeds.
+import statistics # This line imports the statistics package for taking the median of repeated timings.
+import sys # This line imports the sys package for the exit status.
+import time # This line imports the time package for timing.
+import numpy as np # This line imports the numpy package for the volume arrays.
+import SimonHamilton_Hybrid_Inheritance as hi # This line imports the stock trading script.
+import SimonHamilton_Multiple_Inheritance as mi # This line imports the cylinder optimizer script.
+from SimonHamilton_Instrumentation import Instrumentation # This line imports the opt-in instrumentation.
+SEED = 12345 # This line sets the seed used for every generated input, so runs are comparable.
+SIZES = (10, 1_000, 100_000, 1_000_000) # This line sets the portfolio sizes of a full run.
+QUICK_SIZES = (10, 1_000, 10_000) # This line sets the portfolio sizes of a quick run.
+VOLUME_COUNTS = (1, 100, 10_000, 1_000_000) # This line sets the numbers of volumes given to the cylinder optimizer.
+LOOP_LIMIT = 10_000 # This line sets the largest number of volumes sized one call at a time.
+def measure(fn, min_time=0.2, repeats=5): # This function returns the median time of one call of fn, in seconds.
+    number = 1 # This line starts with one call per timing.
+    while True: # This line repeats until a timing is long enough to be accurate.
+        start = time.perf_counter() # This line starts the timer.
+        for _ in range(number): # This line calls the function the chosen number of times.
+            fn() # This line calls the function.
+        elapsed = time.perf_counter() - start # This line records the time taken.
+        if elapsed >= min_time / repeats or number >= 1 << 20: # This line checks if the timing is long enough.
+            break # This line keeps this number of calls.
+        number *= 2 # This line doubles the number of calls.
+    times = [elapsed / number] # This line keeps the first timing.
+    for _ in range(repeats - 1 if elapsed < 1.0 else 2): # This line repeats the timing, fewer times when each one is slow.
+        start = time.perf_counter() # This line starts the timer.
+        for _ in range(number): # This line calls the function the chosen number of times.
+            fn() # This line calls the function.
+        times.append((time.perf_counter() - start) / number) # This line records the time per call.
+    return statistics.median(times) # This line returns the median time per call.
+def record(results, name, seconds, per=1): # This function stores a timing, where per is the number of operations in one timed call.
+    results[name] = {"seconds": seconds / per, "ops_per_sec": per / seconds if seconds else 0.0} # This line stores the time per operation and the throughput.
+    print(f"{name:<60} {seconds / per * 1e6:>14,.3f} us/op {per / seconds if seconds else 0.0:>16,.0f} ops/s") # This line prints the timing.
+def bench_cylinder(results, counts): # This function benchmarks CylinderOptimizer.optimal_dimensions and its batch mode across volume counts.
+    shared = mi.FunctionOps.cache # This line keeps the shared cache so it can be put back.
+    try: # This line makes sure the shared cache is always put back.
+        mi.FunctionOps.cache = mi.ExprCache(maxsize=0, persist=False) # This line turns caching off to time the full symbolic pipeline.
+        optimizer = mi.CylinderOptimizer() # This line creates an optimizer.
+        record(results, "cylinder.optimal_dimensions.uncached", measure(lambda: optimizer.optimal_dimensions(10.0), min_time=0.5, repeats=3)) # This line times one uncached call.
+        mi.FunctionOps.cache = mi.ExprCache(persist=False) # This line uses a memory-only cache, so results do not depend on what is already on disk.
+        optimizer = mi.CylinderOptimizer() # This line creates a fresh optimizer.
+        optimizer.optimal_dimensions(1.0) # This line warms the cache.
+        for n in counts: # This line iterates over the volume counts.
+            volumes = np.linspace(1.0, 1000.0, n) # This line creates the volumes.
+            if n <= LOOP_LIMIT: # This line checks if the loop is fast enough to time at this count.
+                record(results, f"cylinder.optimal_dimensions.loop[{n}]", measure(lambda: [optimizer.optimal_dimensions(float(v)) for v in volumes]), n) # This line times sizing the volumes one call at a time.
+            record(results, f"cylinder.optimal_dimensions_batch[{n}]", measure(lambda: optimizer.optimal_dimensions_batch(volumes)), n) # This line times sizing the volumes in one batch call.
+    finally: # This line runs even if a benchmark fails.
+        mi.FunctionOps.cache = shared # This line puts the shared cache back.
+def bench_trading(results, n_orders=20_000, n_symbols=1_000): # This function benchmarks Tradable.buy and Tradable.sell throughput.
+    rng = random.Random(SEED) # This line creates a seeded random generator.
+    market_map = hi.MarketMap({f"S{i:04d}": hi.CommonStock(f"S{i:04d}", rng.uniform(1, 500), dividend_yield=0.01) for i in range(n_symbols)}) # This line creates the market entities.
+    pairs = [(market_map[f"S{rng.randrange(n_symbols):04d}"], rng.randint(1, 10)) for _ in range(n_orders // 2)] # This line creates the orders, each bought and then sold.
+    for label, make in (("Portfolio", lambda: hi.Portfolio(1e12)), ("PremiumPortfolio.tracked", lambda: hi.PremiumPortfolio(1e12, market_map=market_map))): # This line iterates over a plain and a tracking portfolio.
+        def run(): # This function buys and sells every order once.
+            portfolio = make() # This line creates a fresh portfolio.
+            for entity, q in pairs: # This line iterates over the orders.
+                entity.buy(portfolio, q) # This line buys the quantity.
+                entity.sell(portfolio, q) # This line sells it again.
+        record(results, f"trade.buy_sell.{label}", measure(run), 2 * len(pairs)) # This line times the orders.
+def build_portfolio(mode, market_map, holdings): # This function creates a portfolio in one of the storage and tracking modes.
+    if mode == "columnar": # This line checks for array-backed holdings.
+        portfolio = hi.PremiumPortfolio(0.0, holdings=hi.ColumnarHoldings(market_map, capacity=max(len(holdings), 1))) # This line creates the portfolio with arrays big enough for every holding.
+        for sym, q in holdings.items(): # This line iterates over the holdings.
+            portfolio.holdings[sym] = q # This line stores the holding.
+        return portfolio # This line returns the portfolio.
+    portfolio = hi.PremiumPortfolio(0.0) # This line creates a portfolio with dictionary holdings.
+    portfolio.holdings = dict(holdings) # This line gives it the holdings.
+    if mode == "tracked": # This line checks for running totals.
+        portfolio.track(market_map) # This line starts keeping running totals.
+    return portfolio # This line returns the portfolio.
+def bench_portfolios(results, sizes, modes=("dict", "tracked", "columnar")): # This function benchmarks collect_dividends, total_value, and risk_assessment across portfolio sizes.
+    for n in sizes: # This line iterates over the portfolio sizes.
+        rng = random.Random(SEED + n) # This line creates a seeded random generator for this size.
+        market_map = hi.MarketMap({f"S{i:07d}": (hi.PreferredStock if i % 10 == 0 else hi.CommonStock)(f"S{i:07d}", rng.uniform(1, 500), dividend_yield=rng.uniform(0, 0.05)) for i in range(n)}) # This line creates one market entity per holding.
+        holdings = {sym: rng.randint(1, 100) for sym in market_map} # This line holds every symbol.
+        for mode in modes: # This line iterates over the storage and tracking modes.
+            portfolio = build_portfolio(mode, market_map, holdings) # This line creates the portfolio.
+            for method in ("collect_dividends", "total_value", "risk_assessment"): # This line iterates over the methods.
+                fn = getattr(portfolio, method) # This line gets the method.
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # This line discards the messages printed by preferred dividend calculations.
+                    seconds = measure(lambda: fn(market_map)) # This line times the method.
+                record(results, f"portfolio.{method}.{mode}[{n}]", seconds) # This line stores the timing.
+def compare(results, baseline, tolerance): # This function compares results against a baseline and returns the names of the regressions.
+    regressions = [] # This line initializes the list of regressions.
+    print(f"\n{'benchmark':<60} {'baseline us':>14} {'current us':>14} {'ratio':>7}") # This line prints the table header.
+    for name, current in results.items(): # This line iterates over the results.
+        base = baseline.get("results", {}).get(name) # This line gets the baseline timing, if there is one.
+        if base is None or not base["seconds"]: # This line checks if the benchmark is new.
+            print(f"{name:<60} {'-':>14} {current['seconds'] * 1e6:>14,.3f} {'new':>7}") # This line prints the new benchmark.
+            continue # This line moves on to the next result.
+        ratio = current["seconds"] / base["seconds"] # This line calculates how much slower or faster the benchmark is.
+        flag = " REGRESSION" if ratio > 1 + tolerance else "" # This line flags a slowdown beyond the tolerance.
+        if flag: # This line checks if the benchmark regressed.
+            regressions.append(name) # This line records the regression.
+        print(f"{name:<60} {base['seconds'] * 1e6:>14,.3f} {current['seconds'] * 1e6:>14,.3f} {ratio:>6.2f}x{flag}") # This line prints the comparison.
+    return regressions # This line returns the regressions.
+def main(argv=None): # This function runs the suite from the command line.
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the cylinder optimizer and the stock trading scripts.") # This line creates the option parser.
+    parser.add_argument("--quick", action="store_true", help="use smaller portfolio sizes and volume counts") # This line adds the quick option.
+    parser.add_argument("--sizes", type=int, nargs="+", help="portfolio sizes to benchmark") # This line adds the sizes option.
+    parser.add_argument("--only", choices=("cylinder", "trading", "portfolio"), nargs="+", help="benchmark groups to run") # This line adds the option for choosing groups.
+    parser.add_argument("--json", metavar="PATH", help="write the results to this JSON file") # This line adds the output option.
+    parser.add_argument("--baseline", metavar="PATH", help="compare against results saved with --json") # This line adds the baseline option.
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown allowed before a benchmark counts as a regression (default 0.10)") # This line adds the tolerance option.
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if any benchmark regressed") # This line adds the option for failing on regressions.
+    parser.add_argument("--instrument", action="store_true", help="record call counts and latency histograms of the hot methods during the run") # This line adds the instrumentation option.
+    args = parser.parse_args(argv) # This line reads the options.
+    groups = args.only or ("cylinder", "trading", "portfolio") # This line picks the groups to run.
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES) # This line picks the portfolio sizes.
+    counts = VOLUME_COUNTS[:3] if args.quick else VOLUME_COUNTS # This line picks the volume counts.
+    instrumentation = Instrumentation().enable() if args.instrument else None # This line turns instrumentation on only if it was asked for.
+    results = {} # This line initializes the results.
+    try: # This line makes sure instrumentation is always turned off.
+        if "cylinder" in groups: # This line checks if the cylinder group was chosen.
+            bench_cylinder(results, counts) # This line runs the cylinder benchmarks.
+        if "trading" in groups: # This line checks if the trading group was chosen.
+            bench_trading(results) # This line runs the trading benchmarks.
+        if "portfolio" in groups: # This line checks if the portfolio group was chosen.
+            bench_portfolios(results, sizes) # This line runs the portfolio benchmarks.
+    finally: # This line runs even if a benchmark fails.
+        if instrumentation is not None: # This line checks if instrumentation was on.
+            instrumentation.disable() # This line puts back the original methods.
+    output = { # This line builds the JSON output.
+        "meta": { # This line records where and how the results were produced.
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), # This line records when the run finished.
+            "python": platform.python_version(), # This line records the Python version.
+            "numpy": np.__version__, # This line records the numpy version.
+            "platform": platform.platform(), # This line records the operating system.
+            "machine": platform.machine(), # This line records the processor architecture.
+            "cpu_count": os.cpu_count(), # This line records the number of cores.
+            "seed": SEED, # This line records the seed of the generated inputs.
+            "groups": list(groups), # This line records the groups that were run.
+            "sizes": list(sizes), # This line records the portfolio sizes.
+            "volume_counts": list(counts), # This line records the volume counts.
+            "instrumented": bool(instrumentation), # This line records whether the timings include instrumentation.
+        }, # Termination of the meta dictionary.
+        "results": results, # This line adds the timings.
+    } # Termination of the output dictionary.
+    if instrumentation is not None: # This line checks if instrumentation was on.
+        output["instrumentation"] = instrumentation.report() # This line adds the call counts and latency histograms.
+        print(f"\n{'method':<40} {'calls':>12} {'mean us':>10} {'p50 us':>10} {'p99 us':>10}") # This line prints the instrumentation header.
+        for name, s in output["instrumentation"].items(): # This line iterates over the instrumented methods.
+            print(f"{name:<40} {s['calls']:>12,} {s['mean_us']:>10,.2f} {s['p50_us']:>10,.2f} {s['p99_us']:>10,.2f}") # This line prints the method's statistics.
+    if args.json: # This line checks if an output file was given.
+        with open(args.json, "w", encoding="utf-8") as f: # This line opens the output file.
+            json.dump(output, f, indent=2) # This line writes the results.
+    regressions = [] # This line initializes the regressions.
+    if args.baseline: # This line checks if a baseline was given.
+        with open(args.baseline, encoding="utf-8") as f: # This line opens the baseline file.
+            baseline = json.load(f) # This line reads the baseline.
+        if baseline.get("meta", {}).get("instrumented") != bool(instrumentation): # This line checks if only one of the runs was instrumented.
+            print("\nWarning: only one of the baseline and this run was instrumented, so the timings are not comparable.") # This line warns that the comparison is skewed by the wrappers.
+        regressions = compare(results, baseline, args.tolerance) # This line compares the results against it.
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}") # This line prints the number of regressions.
+    return 1 if regressions and args.fail_on_regression else 0 # This line returns the exit status.
+if __name__ == "__main__": # This line checks if the script is being run directly (not imported as a module).
+    sys.exit(main()) # This line runs the suite and exits with its status.
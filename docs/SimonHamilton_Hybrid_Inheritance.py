@@ -1,11 +1,71 @@
 # This script demonstrates hybrid inheritance in Python through a stock trading application.
 import tkinter as tk # This line imports the tkinter package for creating GUI applications.
 from tkinter import messagebox # This line imports the messagebox module from tkinter for displaying message boxes.
+import asyncio # This line imports the asyncio package for reading live price ticks.
+import collections # This line imports the collections package for keeping recent latency samples.
+import contextlib # This line imports the contextlib package for hiding printed messages in the benchmark.
+import csv # This line imports the csv package for reading order files.
+import gc # This line imports the gc package for collecting garbage between memory measurements.
+import io # This line imports the io package for replaying CSV text in the benchmark.
+import itertools # This line imports the itertools package for reading orders in batches.
+import math # This line imports the math package for comparing floating point totals.
+import multiprocessing # This line imports the multiprocessing package for running portfolios across a process pool.
+import operator # This line imports the operator package for splitting orders into columns.
+import os # This line imports the os package for recognizing file paths.
+import random # This line imports the random package for generating benchmark data.
+import queue # This line imports the queue package for passing work between the Tk main thread and the background thread.
+import subprocess # This line imports the subprocess package for starting the exchange simulator.
+import sys # This line imports the sys package for reading command line arguments.
+import tempfile # This line imports the tempfile package for placing the simulator's socket.
+import threading # This line imports the threading package for running portfolio work off the Tk main thread.
+import time # This line imports the time package for measuring throughput.
+import tracemalloc # This line imports the tracemalloc package for measuring memory per instrument.
+import weakref # This line imports the weakref package, so market entities do not keep portfolios alive.
+from multiprocessing import shared_memory # This line imports shared_memory for publishing market arrays to worker processes once.
+from collections.abc import Mapping, MutableMapping # This line imports Mapping and MutableMapping, which give the instrument views and columnar holdings the same interface as a dictionary.
+import numpy as np # This line imports the numpy package for storing holdings in arrays.
 class MarketEntity: # This defines a new class called MarketEntity.
+    __slots__ = ("symbol", "_price", "_watchers", "__weakref__") # This line stores the fields in slots instead of a __dict__, which saves memory with millions of instruments, and still allows weak references to entities.
     def __init__(self, symbol, price): # This is the constructor method that initializes the class.
-        self.symbol = symbol # This line sets the symbol of the market entity.
-        self.price = price # This line sets the price of the market entity.
+        self.symbol = sys.intern(symbol) if type(symbol) is str else symbol # This line sets the symbol of the market entity, interned so every copy of it shares one string; other kinds of symbol cannot be interned.
+        self._price = price # This line sets the price of the market entity.
+        self._watchers = None # This line holds the portfolios to notify when the price changes, created on the first watch to save memory.
+    @property # This decorator makes price read like an attribute.
+    def price(self): # This method returns the price of the market entity.
+        return self._price # This line returns the price.
+    @price.setter # This decorator runs the method below whenever the price is set.
+    def price(self, value): # This method sets the price and notifies the watching portfolios.
+        old = self._price # This line keeps the old price.
+        self._price = value # This line sets the new price.
+        if self._watchers: # This line checks if any portfolio is watching this entity.
+            self._notify("_price_changed", old, value) # This line tells the watching portfolios about the price change.
+    def _notify(self, hook, old, new): # This method calls the named method of every watching portfolio with the entity and its old and new value.
+        for portfolio in list(self._watchers): # This line iterates over a copy of the watchers, in case one goes away during the loop.
+            getattr(portfolio, hook)(self, old, new) # This line tells the portfolio about the change.
+    def __getstate__(self): # This method returns what is pickled, leaving out the watchers, which are weak references that cannot be pickled.
+        state = {} # This line initializes the pickled fields.
+        for cls in type(self).__mro__: # This line iterates over the classes, since each one adds its own slots.
+            for name in cls.__dict__.get("__slots__", ()): # This line iterates over the slots of the class.
+                if name not in ("_watchers", "__weakref__"): # This line leaves out the watchers and the weak reference slot.
+                    try: # This line attempts to read the slot.
+                        state[name] = cls.__dict__[name].__get__(self) # This line reads the slot directly, since a subclass may hide it behind a property.
+                    except AttributeError: # This line handles a slot that was never set.
+                        pass # This line leaves it out.
+        return state # This line returns the fields to pickle.
+    def __setstate__(self, state): # This method restores an unpickled entity, which starts with no watchers.
+        slots = {name: cls.__dict__[name] for cls in type(self).__mro__ for name in cls.__dict__.get("__slots__", ()) if name != "__weakref__"} # This line finds the slot of every field.
+        for name, value in state.items(): # This line iterates over the pickled fields.
+            slots[name].__set__(self, value) # This line writes the slot directly.
+        self._watchers = None # This line starts with no watchers, like a new entity.
+    def watch(self, portfolio): # This method registers a portfolio to be notified of price changes.
+        if self._watchers is None: # This line checks if this is the first watcher.
+            self._watchers = weakref.WeakSet() # This line creates the set of watchers.
+        self._watchers.add(portfolio) # This line adds the portfolio.
+    def unwatch(self, portfolio): # This method stops notifying a portfolio of price changes.
+        if self._watchers is not None: # This line checks if there are any watchers.
+            self._watchers.discard(portfolio) # This line removes the portfolio.
 class Tradable: # This defines a new class called Tradable.
+    __slots__ = () # This line adds no fields, so classes using this mixin can stay slotted.
     def buy(self, portfolio, qty): # This method allows buying a quantity of the tradable entity.
         cost = self.price * qty # This line calculates the cost of buying the quantity.
         if portfolio.cash_balance < cost: # This line checks if there is enough cash in the portfolio.
@@ -17,21 +77,315 @@ class Tradable: # This defines a new class called Tradable.
         portfolio.remove_position(self.symbol, qty) # This line removes the position from the portfolio.
         portfolio.cash_balance += revenue # This line adds the revenue to the cash balance.
 class DividendPaying: # This defines a new class called DividendPaying.
+    __slots__ = () # This line adds no fields, so classes using this mixin can stay slotted.
     def calculate_dividend(self, qty):  # This method calculates the dividend for a given quantity.
         return qty * self.price * self.dividend_yield # This line calculates the dividend based on the quantity, price, and dividend yield.
 class Stock(MarketEntity, Tradable, DividendPaying): # This defines a new class called Stock that inherits from MarketEntity, Tradable, and DividendPaying. This is the first instance of hybrid inheritance.
+    __slots__ = ("_dividend_yield",) # This line adds the dividend yield slot.
     def __init__(self, symbol, price, dividend_yield=0.0): # This is the constructor method that initializes the class.
         MarketEntity.__init__(self, symbol, price) # This line initializes the MarketEntity class.
-        self.dividend_yield = dividend_yield # This line sets the dividend yield of the stock.
+        self._dividend_yield = dividend_yield # This line sets the dividend yield of the stock.
+    @property # This decorator makes dividend_yield read like an attribute.
+    def dividend_yield(self): # This method returns the dividend yield of the stock.
+        return self._dividend_yield # This line returns the dividend yield.
+    @dividend_yield.setter # This decorator runs the method below whenever the dividend yield is set.
+    def dividend_yield(self, value): # This method sets the dividend yield and notifies the watching portfolios.
+        old = self._dividend_yield # This line keeps the old dividend yield.
+        self._dividend_yield = value # This line sets the new dividend yield.
+        if self._watchers: # This line checks if any portfolio is watching this stock.
+            self._notify("_yield_changed", old, value) # This line tells the watching portfolios about the change.
 class CommonStock(Stock): # This defines a new class called CommonStock that inherits from Stock.
-    pass # This line does not add any new functionality to the Stock class.
+    __slots__ = () # This line does not add any new functionality or fields to the Stock class.
 class PreferredStock(Stock): # This defines a new class called PreferredStock that inherits from Stock.
+    __slots__ = () # This line adds no fields to the Stock class.
     def calculate_dividend(self, qty): # This method overrides the calculate_dividend method from the Stock class.
         print(f"[{self.symbol}] Preferred dividend calc:") # This line prints a message indicating that the preferred dividend calculation is being performed.
         return super().calculate_dividend(qty) # This line calls the calculate_dividend method from the Stock class.
+class _TableRow: # This defines a new class called _TableRow that makes a stock read and write its fields in an InstrumentTable row.
+    __slots__ = () # This line adds no fields, so the classes below only add the table and row.
+    @property # This decorator makes symbol read like an attribute.
+    def symbol(self): # This method returns the symbol of the row.
+        return self._table.symbols[self._row] # This line reads the symbol from the table.
+    @property # This decorator makes price read like an attribute.
+    def price(self): # This method returns the price of the row.
+        return float(self._table.price[self._row]) # This line reads the price from the table.
+    @price.setter # This decorator runs the method below whenever the price is set.
+    def price(self, value): # This method writes the price of the row and notifies the portfolios watching it.
+        old = float(self._table.price[self._row]) # This line keeps the old price.
+        self._table.price[self._row] = value # This line writes the price to the table, where every view sees it.
+        self._table._notify("_price_changed", self, old, value) # This line tells the watching portfolios about the price change.
+    def watch(self, portfolio): # This method registers a portfolio to be notified of price changes to the row, which outlives this object.
+        self._table._watch(self._row, portfolio) # This line stores the watcher in the table.
+    def unwatch(self, portfolio): # This method stops notifying a portfolio of price changes to the row.
+        self._table._unwatch(self._row, portfolio) # This line removes the watcher from the table.
+    def __eq__(self, other): # This method treats two objects viewing the same row of the same table as the same entity, since the table creates a new object on every lookup.
+        return isinstance(other, _TableRow) and other._table is self._table and other._row == self._row # This line compares the table and the row.
+    def __hash__(self): # This method hashes the entity by its table and row, to match __eq__.
+        return hash((id(self._table), self._row)) # This line returns the hash.
+    @property # This decorator makes dividend_yield read like an attribute.
+    def dividend_yield(self): # This method returns the dividend yield of the row.
+        return float(self._table.dividend_yield[self._row]) # This line reads the yield from the table.
+    @dividend_yield.setter # This decorator runs the method below whenever the dividend yield is set.
+    def dividend_yield(self, value): # This method writes the dividend yield of the row and notifies the portfolios watching it.
+        old = float(self._table.dividend_yield[self._row]) # This line keeps the old dividend yield.
+        self._table.dividend_yield[self._row] = value # This line writes the yield to the table, where every view sees it.
+        self._table._notify("_yield_changed", self, old, value) # This line tells the watching portfolios about the change.
+class TableCommonStock(_TableRow, CommonStock): # This defines a new class called TableCommonStock, a CommonStock whose fields live in an InstrumentTable.
+    __slots__ = ("_table", "_row") # This line stores only the table and the row.
+class TablePreferredStock(_TableRow, PreferredStock): # This defines a new class called TablePreferredStock, a PreferredStock whose fields live in an InstrumentTable.
+    __slots__ = ("_table", "_row") # This line stores only the table and the row.
+class InstrumentTable: # This defines a new class called InstrumentTable that stores a security master in numpy arrays.
+    KINDS = (CommonStock, PreferredStock) # This line lists the kinds of instrument, numbered by their position.
+    ROW_CLASSES = (TableCommonStock, TablePreferredStock) # This line lists the class used to view a row of each kind.
+    def __init__(self, capacity=1024): # This is the constructor method that initializes the class.
+        self._index = {} # This line initializes a dictionary from each symbol to its row.
+        self.symbols = [] # This line initializes the list of interned symbols in row order.
+        self.price = np.zeros(capacity) # This line creates the array of prices.
+        self.dividend_yield = np.zeros(capacity) # This line creates the array of dividend yields.
+        self.kind = np.zeros(capacity, dtype=np.uint8) # This line creates the array of instrument kinds.
+        self._watchers = {} # This line maps a row to the portfolios watching its price, created on the first watch of the row to save memory.
+        self._version = 0 # This line counts the changes that views cannot report through watchers, which are new symbols and changes of kind.
+    @classmethod # This decorator indicates that the method receives the class instead of an instance.
+    def from_market_map(cls, market_map): # This method builds a table from the entities of a market map.
+        table = cls(capacity=max(len(market_map), 1)) # This line creates a table big enough for every entity.
+        for sym, entity in market_map.items(): # This line iterates over the market entities.
+            table.add(sym, entity.price, entity.dividend_yield, PreferredStock if isinstance(entity, PreferredStock) else CommonStock) # This line adds the entity.
+        return table # This line returns the table.
+    def add(self, symbol, price, dividend_yield=0.0, kind=CommonStock): # This method adds an instrument, or updates it if the symbol is already there.
+        row = self._index.get(symbol) # This line gets the row of the symbol, if it is already there.
+        if row is None: # This line checks if the symbol is new.
+            row = len(self.symbols) # This line puts the symbol in the next free row.
+            if row == len(self.price): # This line checks if the arrays are full.
+                for name in ("price", "dividend_yield", "kind"): # This line iterates over the arrays.
+                    old = getattr(self, name) # This line gets the full array.
+                    new = np.zeros(len(old) * 2, dtype=old.dtype) # This line creates an array twice the size.
+                    new[:len(old)] = old # This line copies the old values.
+                    setattr(self, name, new) # This line replaces the array.
+            if type(symbol) is str: # This line checks if the symbol is a string, since other kinds of symbol cannot be interned.
+                symbol = sys.intern(symbol) # This line interns the symbol, so every copy of it shares one string.
+            self._index[symbol] = row # This line records the row of the symbol.
+            self.symbols.append(symbol) # This line adds the symbol to the list.
+            self.price[row] = price # This line sets the price.
+            self.dividend_yield[row] = dividend_yield # This line sets the dividend yield.
+            self.kind[row] = self.KINDS.index(kind) # This line sets the kind of instrument.
+            self._version += 1 # This line counts the new symbol.
+            return # This line leaves nothing to notify, since no portfolio watches a new row.
+        code = self.KINDS.index(kind) # This line gets the number of the kind.
+        if code != self.kind[row]: # This line checks if the kind of instrument changed, which turns the row into a different class of entity.
+            self.price[row] = price # This line sets the price.
+            self.dividend_yield[row] = dividend_yield # This line sets the dividend yield.
+            self.kind[row] = code # This line sets the kind of instrument.
+            self._version += 1 # This line counts the change, so running totals read the row again instead of adjusting for it.
+            return # This line leaves the watchers to notice the new version.
+        entity = self.entity(symbol) # This line creates an entity for the row, whose setters notify the watching portfolios.
+        entity.price = price # This line sets the price first, so the price change is applied at the old dividend yield.
+        entity.dividend_yield = dividend_yield # This line sets the dividend yield, which is applied at the new price.
+    def _watch(self, row, portfolio): # This method registers a portfolio to be notified of price changes to a row.
+        self._watchers.setdefault(row, weakref.WeakSet()).add(portfolio) # This line adds the portfolio, creating the set of watchers for the row if needed.
+    def _unwatch(self, row, portfolio): # This method stops notifying a portfolio of price changes to a row.
+        watchers = self._watchers.get(row) # This line gets the watchers of the row, if any.
+        if watchers is not None: # This line checks if the row has watchers.
+            watchers.discard(portfolio) # This line removes the portfolio.
+            if not watchers: # This line checks if no portfolio is left watching the row.
+                del self._watchers[row] # This line frees the empty set.
+    def __getstate__(self): # This method returns what is pickled, leaving out the watchers, which are weak references that cannot be pickled.
+        state = dict(self.__dict__) # This line copies the fields.
+        state["_watchers"] = {} # This line starts the unpickled table with no watchers.
+        return state # This line returns the fields to pickle.
+    def _notify(self, hook, entity, old, new): # This method calls the named method of every portfolio watching an entity's row with the entity and its old and new value.
+        watchers = self._watchers.get(entity._row) # This line gets the watchers of the row, if any.
+        if watchers and old != new: # This line checks if any portfolio is watching the row and the value changed.
+            for portfolio in list(watchers): # This line iterates over a copy of the watchers, in case one goes away during the loop.
+                getattr(portfolio, hook)(entity, old, new) # This line tells the portfolio about the change.
+    def __len__(self): # This method returns the number of instruments.
+        return len(self.symbols) # This line returns the number of symbols.
+    def entity(self, symbol): # This method returns a stock object viewing the row of a symbol, created on demand.
+        row = self._index[symbol] # This line gets the row, raising KeyError for unknown symbols like a dictionary does.
+        obj = self.ROW_CLASSES[self.kind[row]].__new__(self.ROW_CLASSES[self.kind[row]]) # This line creates the object without running the stock constructor.
+        obj._table, obj._row, obj._watchers = self, row, None # This line points the object at the row.
+        return obj # This line returns the object.
+    def view(self, symbols=None): # This method returns a market map view of the table, optionally limited to some symbols.
+        return InstrumentView(self, symbols) # This line creates the view.
+class InstrumentView(Mapping): # This defines a new class called InstrumentView, a read-only market map whose entities are created from an InstrumentTable on demand.
+    def __init__(self, table, symbols=None): # This is the constructor method that initializes the class.
+        self.table = table # This line sets the table.
+        self._symbols = None if symbols is None else [s for s in symbols if s in table._index] # This line keeps the symbols of the view, or None for every symbol.
+        self._members = None if symbols is None else set(self._symbols) # This line keeps a set of the symbols for fast membership checks.
+    def __getitem__(self, symbol): # This method returns the entity for a symbol.
+        if self._members is not None and symbol not in self._members: # This line checks if the symbol is outside the view.
+            raise KeyError(symbol) # This line raises KeyError like a dictionary does.
+        return self.table.entity(symbol) # This line creates the entity.
+    def __iter__(self): # This method iterates over the symbols of the view.
+        return iter(self.table.symbols if self._symbols is None else self._symbols) # This line returns an iterator over the symbols.
+    def __len__(self): # This method returns the number of symbols in the view.
+        return len(self.table) if self._symbols is None else len(self._symbols) # This line returns the number of symbols.
+    def __contains__(self, symbol): # This method checks if a symbol is in the view without creating its entity.
+        return symbol in (self.table._index if self._members is None else self._members) # This line checks the index.
+    @property # This decorator makes version read like an attribute.
+    def version(self): # This method returns the change counter of the table, which running totals compare like the version of a MarketMap.
+        return self.table._version # This line returns the change counter.
+class _HoldingsWatcher: # This defines a new class called _HoldingsWatcher that receives price and dividend yield changes for a ColumnarHoldings, which cannot be kept in a WeakSet itself because mappings are not hashable.
+    __slots__ = ("_holdings", "__weakref__") # This line stores only a weak reference to the holdings, and allows weak references to the watcher.
+    def __init__(self, holdings): # This is the constructor method that initializes the class.
+        self._holdings = weakref.ref(holdings) # This line refers to the holdings without keeping them alive.
+    def _price_changed(self, entity, old, new): # This method passes a price change on to the holdings.
+        holdings = self._holdings() # This line gets the holdings, if they still exist.
+        if holdings is not None: # This line checks if the holdings still exist.
+            holdings._price_changed(entity, old, new) # This line updates the price array.
+    def _yield_changed(self, entity, old, new): # This method passes a dividend yield change on to the holdings.
+        holdings = self._holdings() # This line gets the holdings, if they still exist.
+        if holdings is not None: # This line checks if the holdings still exist.
+            holdings._yield_changed(entity, old, new) # This line updates the dividend yield array.
+class MarketMap(dict): # This defines a new class called MarketMap, a dictionary of market entities that counts every change to which entities it holds.
+    __slots__ = ("version",) # This line stores the change counter, which running totals compare to notice added, removed, or replaced entities without checking each one.
+    def __init__(self, *args, **kwargs): # This is the constructor method that initializes the class.
+        super().__init__(*args, **kwargs) # This line fills the dictionary.
+        self.version = 0 # This line initializes the change counter.
+    def __reduce__(self): # This method pickles the market map by its entities, so unpickling fills it before the change counter exists.
+        return type(self), (dict(self),) # This line rebuilds the market map from a plain dictionary.
+    def __setitem__(self, symbol, entity): # This method adds or replaces an entity.
+        super().__setitem__(symbol, entity) # This line stores the entity.
+        self.version += 1 # This line counts the change.
+    def __delitem__(self, symbol): # This method removes an entity.
+        super().__delitem__(symbol) # This line removes the entity.
+        self.version += 1 # This line counts the change.
+    def pop(self, *args): # This method removes an entity and returns it.
+        self.version += 1 # This line counts the change.
+        return super().pop(*args) # This line removes the entity.
+    def popitem(self): # This method removes the last entity and returns it with its symbol.
+        self.version += 1 # This line counts the change.
+        return super().popitem() # This line removes the entity.
+    def clear(self): # This method removes every entity.
+        self.version += 1 # This line counts the change.
+        super().clear() # This line removes the entities.
+    def update(self, *args, **kwargs): # This method adds or replaces several entities.
+        self.version += 1 # This line counts the change.
+        super().update(*args, **kwargs) # This line stores the entities.
+    def setdefault(self, symbol, entity=None): # This method adds an entity if the symbol is missing and returns the entity held.
+        if symbol not in self: # This line checks if the symbol is missing.
+            self.version += 1 # This line counts the change.
+        return super().setdefault(symbol, entity) # This line returns the entity held.
+    def __ior__(self, other): # This method adds or replaces several entities with the |= operator.
+        self.update(other) # This line stores the entities and counts the change.
+        return self # This line returns the market map.
+def _entities_changed(market_map, seen): # This function checks if any symbol in seen now maps to a different entity, or to none, in the market map.
+    return any(map(operator.ne, map(market_map.get, seen), seen.values())) # This line compares every entity, using equality so that equal table rows count as unchanged.
+class ColumnarHoldings(MutableMapping): # This defines a new class called ColumnarHoldings that stores holdings in numpy arrays indexed by symbol.
+    COLUMNS = ("qty", "price", "dividend_yield", "preferred") # This line lists the arrays kept for every symbol.
+    def __init__(self, market_map=None, capacity=1024): # This is the constructor method that initializes the class.
+        self._index = {} # This line initializes a dictionary from each symbol to its row in the arrays.
+        self._symbols = [] # This line initializes the list of symbols in row order.
+        self.qty = np.zeros(capacity) # This line creates the array of quantities held.
+        self.price = np.zeros(capacity) # This line creates the array of prices, which is zero for symbols missing from the market map.
+        self.dividend_yield = np.zeros(capacity) # This line creates the array of dividend yields, which is zero for symbols that do not pay dividends.
+        self.preferred = np.zeros(capacity, dtype=bool) # This line creates the array of flags marking preferred stocks.
+        self.market_map = None # This line holds the market map that the price, yield, and preferred arrays were read from.
+        self._entities = [] # This line initializes the list of market entities the rows were read from, in row order, with None for symbols missing from the market map.
+        self._map_version = None # This line holds the version of the market map when the arrays were read, if it has one.
+        self._watcher = _HoldingsWatcher(self) # This line creates the watcher that the market entities notify when their price changes.
+        if market_map is not None: # This line checks if a market map was given.
+            self.refresh(market_map) # This line reads the market columns from the market map.
+    def refresh(self, market_map=None): # This method reads the price, yield, and preferred arrays again, for a new market map or after entities in it are added, removed, or replaced.
+        self._unwatch_all() # This line stops watching the entities the rows were read from.
+        if market_map is not None: # This line checks if a market map was given.
+            self.market_map = market_map # This line sets the market map.
+        self._map_version = getattr(self.market_map, "version", None) # This line records the version of the market map, if it has one.
+        for row, sym in enumerate(self._symbols): # This line iterates over every symbol held.
+            self._read_market(row, sym) # This line reads the market columns for the symbol.
+    def __getstate__(self): # This method returns what is pickled, leaving out the watcher, which holds a weak reference that cannot be pickled.
+        state = dict(self.__dict__) # This line copies the fields.
+        del state["_watcher"] # This line leaves out the watcher.
+        return state # This line returns the fields to pickle.
+    def __setstate__(self, state): # This method restores unpickled holdings and watches their entities again.
+        self.__dict__.update(state) # This line restores the fields.
+        self._watcher = _HoldingsWatcher(self) # This line creates a new watcher.
+        if self.market_map is not None: # This line checks if there is a market map.
+            self.refresh() # This line reads the market columns again and watches the unpickled entities.
+    def _unwatch_all(self): # This method stops watching every entity the rows were read from.
+        for entity in self._entities: # This line iterates over the entities of every row.
+            if entity is not None: # This line checks if the symbol was in the market map.
+                entity.unwatch(self._watcher) # This line stops watching the entity.
+    def _stale(self): # This method checks if entities were added to, removed from, or replaced in the market map since the arrays were read.
+        if self._map_version is not None: # This line checks if the market map counts its changes.
+            return getattr(self.market_map, "version", None) != self._map_version # This line compares the versions, which takes constant time.
+        return any(map(operator.ne, map(self.market_map.get, self._symbols), self._entities)) # This line compares the entity of every row, for a plain dictionary that cannot report changes.
+    def _sync(self, market_map): # This method makes sure the arrays match the given market map before a query.
+        if market_map is not self.market_map or self._stale(): # This line checks if a different market map is being used, or its entities changed.
+            self.refresh(market_map) # This line reads the market columns from it; price and yield changes do not need this, since the watched entities report them.
+    def _read_market(self, row, sym): # This method reads the market columns of one row and watches the entity for price and dividend yield changes.
+        entity = self.market_map.get(sym) if self.market_map is not None else None # This line gets the market entity, if there is one.
+        self._entities[row] = entity # This line records the entity the row was read from.
+        self.price[row] = entity.price if entity is not None else 0.0 # This line sets the price, so symbols missing from the market map add nothing to the value.
+        self.dividend_yield[row] = entity.dividend_yield if isinstance(entity, DividendPaying) else 0.0 # This line sets the yield, so entities that do not pay dividends add nothing to the dividends.
+        self.preferred[row] = isinstance(entity, PreferredStock) # This line sets whether the entity is a preferred stock.
+        if entity is not None: # This line checks if the symbol is in the market map.
+            entity.watch(self._watcher) # This line keeps the price and yield arrays up to date when the entity changes.
+    def _price_changed(self, entity, old, new): # This method updates the price array when a watched entity changes price.
+        if self.market_map is not None and self.market_map.get(entity.symbol) == entity: # This line ignores entities that are no longer in the market map; an InstrumentView creates a new but equal entity on every lookup.
+            self.set_price(entity.symbol, new) # This line sets the price.
+    def _yield_changed(self, entity, old, new): # This method updates the dividend yield array when a watched stock changes dividend yield.
+        row = self._index.get(entity.symbol) # This line gets the row of the symbol, if it is held.
+        if row is not None and self._entities[row] == entity: # This line ignores entities the row was not read from.
+            self.dividend_yield[row] = new # This line sets the yield.
+    def _grow(self): # This method doubles the size of every array when they are full.
+        for name in self.COLUMNS: # This line iterates over the arrays.
+            old = getattr(self, name) # This line gets the full array.
+            new = np.zeros(len(old) * 2, dtype=old.dtype) # This line creates an array twice the size.
+            new[:len(old)] = old # This line copies the old values.
+            setattr(self, name, new) # This line replaces the array.
+    def set_price(self, symbol, price): # This method updates the price of one held symbol without reading the whole market map again.
+        row = self._index.get(symbol) # This line gets the row of the symbol, if it is held.
+        if row is not None: # This line checks if the symbol is held.
+            self.price[row] = price # This line sets the price.
+    def __getitem__(self, symbol): # This method returns the quantity held of a symbol.
+        q = float(self.qty[self._index[symbol]]) # This line gets the quantity as a float.
+        return int(q) if q.is_integer() else q # This line returns whole quantities as integers, like the dictionary holdings do.
+    def __setitem__(self, symbol, qty): # This method sets the quantity held of a symbol.
+        row = self._index.get(symbol) # This line gets the row of the symbol, if it is already held.
+        if row is None: # This line checks if the symbol is new.
+            row = len(self._symbols) # This line puts the symbol in the next free row.
+            if row == len(self.qty): # This line checks if the arrays are full.
+                self._grow() # This line makes room for more rows.
+            self._index[symbol] = row # This line records the row of the symbol.
+            self._symbols.append(symbol) # This line adds the symbol to the list.
+            self._entities.append(None) # This line makes room for the entity of the new row.
+            self._read_market(row, symbol) # This line reads the market columns for the new symbol.
+        self.qty[row] = qty # This line sets the quantity.
+    def __delitem__(self, symbol): # This method removes a symbol by moving the last row into its place.
+        row = self._index.pop(symbol) # This line removes the symbol from the index and gets its row.
+        entity = self._entities[row] # This line gets the entity the row was read from, if there was one.
+        if entity is not None: # This line checks if the symbol was in the market map.
+            entity.unwatch(self._watcher) # This line stops watching the entity.
+        last = len(self._symbols) - 1 # This line gets the last row.
+        moved = self._symbols.pop() # This line removes the last symbol from the list.
+        moved_entity = self._entities.pop() # This line removes the last entity from the list.
+        if row != last: # This line checks if the removed symbol was not in the last row.
+            for name in self.COLUMNS: # This line iterates over the arrays.
+                column = getattr(self, name) # This line gets the array.
+                column[row] = column[last] # This line copies the last row into the free row.
+            self._symbols[row] = moved # This line moves the last symbol into the free row.
+            self._entities[row] = moved_entity # This line moves the last entity into the free row.
+            self._index[moved] = row # This line records the new row of the moved symbol.
+        self.qty[last] = 0 # This line clears the quantity in the row that is no longer used.
+    def __iter__(self): # This method iterates over the symbols held.
+        return iter(self._symbols) # This line returns an iterator over the symbols.
+    def __len__(self): # This method returns the number of symbols held.
+        return len(self._symbols) # This line returns the number of symbols.
+    def total_value(self, market_map): # This method calculates the value of every holding in one vectorized pass.
+        self._sync(market_map) # This line makes sure the prices come from the given market map.
+        n = len(self._symbols) # This line gets the number of rows in use.
+        return float(np.dot(self.qty[:n], self.price[:n])) # This line returns the sum of quantity times price.
+    def dividends(self, market_map): # This method calculates the dividends of every holding in one vectorized pass.
+        self._sync(market_map) # This line makes sure the prices and yields come from the given market map.
+        n = len(self._symbols) # This line gets the number of rows in use.
+        return float(np.dot(self.qty[:n] * self.price[:n], self.dividend_yield[:n])) # This line returns the sum of quantity times price times yield.
+    def preferred_value(self, market_map): # This method calculates the value of the preferred stocks in one vectorized pass.
+        self._sync(market_map) # This line makes sure the prices and flags come from the given market map.
+        n = len(self._symbols) # This line gets the number of rows in use.
+        return float(np.dot(self.qty[:n], np.where(self.preferred[:n], self.price[:n], 0.0))) # This line returns the sum of quantity times price for preferred stocks only.
 class Portfolio: # This defines a new class called Portfolio.
-    def __init__(self, initial_cash=10_000.0): # This is the constructor method that initializes the class.
-        self.holdings = {} # This line initializes an empty dictionary to hold the portfolio's holdings.
+    def __init__(self, initial_cash=10_000.0, holdings=None): # This is the constructor method that initializes the class.
+        self.holdings = {} if holdings is None else holdings # This line initializes an empty dictionary to hold the portfolio's holdings, unless other storage such as ColumnarHoldings was given.
         self.cash_balance = initial_cash # This line sets the initial cash balance of the portfolio.
     def add_position(self, symbol, qty): # This method adds a position to the portfolio.
         self.holdings[symbol] = self.holdings.get(symbol, 0) + qty # This line updates the holdings dictionary with the new quantity.
@@ -42,6 +396,10 @@ class Portfolio: # This defines a new class called Portfolio.
         self.holdings[symbol] = current - qty # This line updates the holdings dictionary with the new quantity.
     def view_positions(self): # This method returns the current positions in the portfolio.
         return dict(self.holdings) # This line returns a copy of the holdings dictionary.
+    def revalue(self, market_map, symbols): # This method is called by a MarketFeed after prices change.
+        if isinstance(self.holdings, ColumnarHoldings) and self.holdings.market_map is market_map: # This line checks if the holdings keep their own array of prices from the same market map.
+            for sym in symbols: # This line iterates over the updated symbols.
+                self.holdings.set_price(sym, market_map[sym].price) # This line updates the price in the array.
     def deposit_cash(self, amount): # This method allows depositing cash into the portfolio.
         if amount <= 0: # This line checks if the deposit amount is positive.
             raise ValueError("Deposit must be positive.") # This line raises an error if the deposit amount is not positive.
@@ -49,6 +407,10 @@ class Portfolio: # This defines a new class called Portfolio.
     def display_cash(self): # This method returns the current cash balance of the portfolio.
         return self.cash_balance # This line returns the cash balance.
     def collect_dividends(self, market_map): # This method collects dividends from the holdings in the portfolio.
+        if isinstance(self.holdings, ColumnarHoldings): # This line checks if the holdings are stored in arrays.
+            total = self.holdings.dividends(market_map) # This line calculates every dividend in one pass; calculate_dividend is not called per symbol, so preferred stocks print no message.
+            self.cash_balance += total # This line adds the total dividends collected to the cash balance.
+            return total # This line returns the total dividends collected.
         total = 0.0 # This line initializes a variable to hold the total dividends collected.
         for sym, qty in self.holdings.items(): # This line iterates over the holdings in the portfolio.
             entity = market_map.get(sym) # This line gets the market entity from the market map.
@@ -59,6 +421,8 @@ class Portfolio: # This defines a new class called Portfolio.
         return total # This line returns the total dividends collected.
 class AnalyticsMixin: # This defines a new class called AnalyticsMixin.
     def total_value(self, market_map): # This method calculates the total value of the portfolio.
+        if isinstance(self.holdings, ColumnarHoldings): # This line checks if the holdings are stored in arrays.
+            return self.holdings.total_value(market_map) # This line calculates the value in one pass.
         return sum( # This line initializes a variable to hold the total value.
             market_map[s].price * q # This line calculates the total value of the holdings.
             for s, q in self.holdings.items() # This line iterates over the holdings in the portfolio.
@@ -69,30 +433,774 @@ class BasicPortfolio(Portfolio): # This defines a new class called BasicPortfoli
 class AdvancedPortfolio(BasicPortfolio, AnalyticsMixin): # This defines a new class called AdvancedPortfolio that inherits from BasicPortfolio and AnalyticsMixin, demonstrating multiple inheritance.
     pass # This line does not add any new functionality to the BasicPortfolio class.
 class PremiumPortfolio(AdvancedPortfolio): # This defines a new class called PremiumPortfolio that inherits from AdvancedPortfolio.
+    def __init__(self, initial_cash=10_000.0, holdings=None, market_map=None): # This is the constructor method that initializes the class.
+        super().__init__(initial_cash, holdings) # This line initializes the Portfolio class.
+        self.market_map = None # This line holds the market map whose running totals are kept, if any.
+        self.check_consistency = False # This line sets whether every query compares the running totals against a full recompute.
+        self._market_value = 0.0 # This line initializes the running market value of the holdings.
+        self._preferred_value = 0.0 # This line initializes the running market value of the preferred stocks.
+        self._dividend_income = 0.0 # This line initializes the running expected dividend income.
+        self._entities = {} # This line maps each held symbol to the entity the running totals were calculated from, or None if it was missing from the market map.
+        self._map_version = None # This line holds the version of the tracked market map when the totals were last calculated, if it has one.
+        if market_map is not None: # This line checks if a market map was given.
+            self.track(market_map) # This line starts keeping running totals for it.
+    def track(self, market_map): # This method starts keeping running totals against a market map, replacing any previous one.
+        for entity in self._entities.values(): # This line iterates over the entities watched so far.
+            if entity is not None: # This line checks if there was an entity.
+                entity.unwatch(self) # This line stops watching the old entity.
+        self.market_map = market_map # This line sets the tracked market map.
+        self._map_version = getattr(market_map, "version", None) # This line records the version of the market map, if it has one.
+        self._market_value, self._preferred_value, self._dividend_income = self._recompute() # This line calculates the running totals from scratch.
+        self._entities = {sym: market_map.get(sym) for sym in self.holdings} # This line records the entity of every held symbol.
+        for entity in self._entities.values(): # This line iterates over the held entities.
+            if entity is not None: # This line checks if the symbol is in the market map.
+                entity.watch(self) # This line watches the entity for price and dividend yield changes.
+    def __setstate__(self, state): # This method restores an unpickled portfolio and watches its unpickled entities again.
+        self.__dict__.update(state) # This line restores the fields.
+        if self.market_map is not None: # This line checks if running totals were kept.
+            self._entities = {} # This line forgets the old entities, which were never watched in this process.
+            self.track(self.market_map) # This line calculates the totals again and watches the entities.
+    def _stale(self): # This method checks if entities were added to, removed from, or replaced in the tracked market map since the totals were calculated.
+        if self._map_version is not None: # This line checks if the market map counts its changes.
+            return getattr(self.market_map, "version", None) != self._map_version # This line compares the versions, which takes constant time.
+        return _entities_changed(self.market_map, self._entities) # This line compares every held entity, for a plain dictionary that cannot report changes.
+    def _resync(self): # This method calculates the running totals again if the tracked market map changed which entities it holds.
+        if self.market_map is not None and self._stale(): # This line checks if the totals are out of date.
+            self.track(self.market_map) # This line calculates the totals from scratch and watches the new entities.
+    def _terms(self, entity, qty): # This method returns what a quantity of an entity adds to the market value, preferred value, and dividend income.
+        value = entity.price * qty # This line calculates the market value.
+        pref = value if isinstance(entity, PreferredStock) else 0.0 # This line counts the value as preferred only for preferred stocks.
+        div = value * entity.dividend_yield if isinstance(entity, DividendPaying) else 0.0 # This line calculates the dividend the same way as calculate_dividend, without its message.
+        return value, pref, div # This line returns the three amounts.
+    def _recompute(self): # This method calculates the running totals with a full pass over the holdings.
+        totals = [0.0, 0.0, 0.0] # This line initializes the three totals.
+        for sym, qty in self.holdings.items(): # This line iterates over the holdings in the portfolio.
+            entity = self.market_map.get(sym) # This line gets the market entity from the market map.
+            if entity is not None: # This line checks if the symbol is in the market map.
+                for i, amount in enumerate(self._terms(entity, qty)): # This line iterates over the three amounts for the holding.
+                    totals[i] += amount # This line adds the amount to its total.
+        return tuple(totals) # This line returns the three totals.
+    def _apply(self, symbol, qty): # This method adds a change in quantity to the running totals.
+        entity = self.market_map.get(symbol) # This line gets the market entity from the market map.
+        if symbol in self._entities and self._entities[symbol] != entity: # This line checks if the symbol's entity was replaced since the totals were calculated.
+            self.track(self.market_map) # This line calculates the totals from scratch, which already include this change.
+            return # This line leaves the totals alone.
+        self._entities[symbol] = entity # This line records the entity of the symbol.
+        if entity is None: # This line checks if the symbol is not in the market map.
+            return # This line leaves the totals alone, like total_value does.
+        value, pref, div = self._terms(entity, qty) # This line calculates the amounts for the change.
+        self._market_value += value # This line updates the market value.
+        self._preferred_value += pref # This line updates the preferred value.
+        self._dividend_income += div # This line updates the dividend income.
+        entity.watch(self) # This line watches the entity for price changes.
+    def _price_changed(self, entity, old, new): # This method updates the running totals when a watched entity changes price.
+        if self.market_map is None or self.market_map.get(entity.symbol) != entity: # This line ignores entities that are not in the tracked market map; an InstrumentView creates a new but equal entity on every lookup.
+            return # This line leaves the totals alone.
+        qty = self.holdings.get(entity.symbol, 0) # This line gets the quantity held.
+        delta = (new - old) * qty # This line calculates the change in market value.
+        self._market_value += delta # This line updates the market value.
+        self._preferred_value += delta if isinstance(entity, PreferredStock) else 0.0 # This line updates the preferred value for preferred stocks.
+        self._dividend_income += delta * entity.dividend_yield if isinstance(entity, DividendPaying) else 0.0 # This line updates the dividend income for dividend-paying stocks.
+    def _yield_changed(self, entity, old, new): # This method updates the running dividend income when a watched stock changes dividend yield.
+        if self.market_map is None or self.market_map.get(entity.symbol) != entity: # This line ignores entities that are not in the tracked market map.
+            return # This line leaves the totals alone.
+        self._dividend_income += entity.price * self.holdings.get(entity.symbol, 0) * (new - old) # This line updates the dividend income.
+    def add_position(self, symbol, qty): # This method adds a position to the portfolio and updates the running totals.
+        super().add_position(symbol, qty) # This line adds the position.
+        if self.market_map is not None: # This line checks if running totals are kept.
+            self._apply(symbol, qty) # This line adds the position to the totals.
+    def remove_position(self, symbol, qty): # This method removes a position from the portfolio and updates the running totals.
+        super().remove_position(symbol, qty) # This line removes the position, raising an error before the totals change if there is not enough to sell.
+        if self.market_map is not None: # This line checks if running totals are kept.
+            self._apply(symbol, -qty) # This line takes the position out of the totals.
+    def _tracking(self, market_map): # This method checks if queries against a market map can use the running totals.
+        if market_map is None or market_map is not self.market_map: # This line checks if the market map is not the tracked one.
+            return False # This line reports that a full calculation is needed.
+        self._resync() # This line calculates the totals again if entities were added, removed, or replaced.
+        if self.check_consistency: # This line checks if every query should be checked.
+            self.verify_aggregates() # This line compares the running totals against a full recompute.
+        return True # This line reports that the running totals can be used.
+    def verify_aggregates(self, rel_tol=1e-9, abs_tol=1e-6): # This method compares the running totals against a full recompute.
+        self._resync() # This line first catches up with entities that were added, removed, or replaced, which queries also do.
+        expected = self._recompute() # This line calculates the totals from scratch.
+        actual = (self._market_value, self._preferred_value, self._dividend_income) # This line gets the running totals.
+        for name, a, e in zip(("market value", "preferred value", "dividend income"), actual, expected): # This line iterates over the totals.
+            if not math.isclose(a, e, rel_tol=rel_tol, abs_tol=abs_tol): # This line checks if a total has drifted.
+                raise RuntimeError(f"Running {name} is {a:.6f} but a full recompute gives {e:.6f}.") # This line raises an error naming the total.
+        return True # This line reports that the totals are consistent.
+    def total_value(self, market_map): # This method returns the total value of the portfolio, in constant time for the tracked market map.
+        if self._tracking(market_map): # This line checks if the running totals can be used.
+            return self._market_value # This line returns the running market value.
+        return super().total_value(market_map) # This line calculates the value with a full pass.
+    def expected_dividends(self, market_map=None): # This method returns the dividends that collect_dividends would pay now.
+        if market_map is None: # This line checks if no market map was given.
+            if self.market_map is None: # This line checks if no market map is tracked either.
+                raise ValueError("Pass a market map, or call track() first.") # This line raises an error, since there are no prices to use.
+            market_map = self.market_map # This line uses the tracked market map.
+        if self._tracking(market_map): # This line checks if the running totals can be used.
+            return self._dividend_income # This line returns the running dividend income.
+        return sum( # This line calculates the dividends with a full pass.
+            market_map[s].price * q * market_map[s].dividend_yield # This line calculates the dividend for a holding.
+            for s, q in self.holdings.items() # This line iterates over the holdings in the portfolio.
+            if isinstance(market_map.get(s), DividendPaying) # This line checks if the entity is a dividend-paying stock.
+        ) # Termination of the sum function.
     def risk_assessment(self, market_map): # This method assesses the risk of the portfolio.
-        total = self.total_value(market_map) + self.cash_balance # This line calculates the total value of the portfolio including cash.
+        if self._tracking(market_map): # This line checks if the running totals can be used.
+            total = self._market_value + self.cash_balance # This line calculates the total value of the portfolio including cash.
+            pref_value = self._preferred_value # This line gets the running value of the preferred stocks.
+        else: # This line handles a market map that is not tracked.
+            total = self.total_value(market_map) + self.cash_balance # This line calculates the total value of the portfolio including cash.
+            if isinstance(self.holdings, ColumnarHoldings): # This line checks if the holdings are stored in arrays.
+                pref_value = self.holdings.preferred_value(market_map) # This line calculates the value of the preferred stocks in one pass.
+            else: # This line handles holdings stored in a dictionary.
+                pref_value = sum( # This line initializes a variable to hold the total value of preferred stocks.
+                    market_map[s].price * q # This line calculates the total value of the preferred stocks.
+                    for s, q in self.holdings.items() # This line iterates over the holdings in the portfolio.
+                    if isinstance(market_map[s], PreferredStock) # This line checks if the entity is a preferred stock.
+                ) # Termination of the sum function.
         if total == 0: # This line checks if the total value is zero.
             return "N/A" # This line returns "N/A" if the total value is zero.
-        pref_value = sum( # This line initializes a variable to hold the total value of preferred stocks.
-            market_map[s].price * q # This line calculates the total value of the preferred stocks.
-            for s, q in self.holdings.items() # This line iterates over the holdings in the portfolio.
-            if isinstance(market_map[s], PreferredStock) # This line checks if the entity is a preferred stock.
-        ) # Termination of the sum function.
         pct = (pref_value / total) * 100 # This line calculates the percentage of preferred stocks in the portfolio.
         return f"{pct:.1f}% preferred holdings" # This line returns the percentage of preferred stocks in the portfolio formatted to one decimal place.
+class _OrderColumns: # This defines a new class called _OrderColumns, a batch of orders read from a CSV file as four columns of text.
+    __slots__ = ("columns",) # This line stores only the columns.
+    def __init__(self, *columns): # This is the constructor method that initializes the class.
+        self.columns = columns # This line sets the symbol, side, quantity, and price columns.
+    def __len__(self): # This method returns the number of orders.
+        return len(self.columns[0]) # This line returns the length of the symbol column.
+    def __getitem__(self, i): # This method returns one order as a tuple, for the rejection report.
+        return tuple(column[i] for column in self.columns) # This line gets the order's field from every column.
+class OrderExecutor: # This defines a new class called OrderExecutor that applies many orders to a portfolio in batches.
+    SIDES = {"buy": 1.0, "sell": -1.0} # This line maps each order side to the sign of its change in quantity.
+    ORDER_DTYPE = [("symbol", "U16"), ("side", "U4"), ("qty", "f8"), ("price", "f8")] # This line defines the numpy record layout for orders, where a price of nan means the market price.
+    def __init__(self, market_map, batch_size=10_000): # This is the constructor method that initializes the class.
+        self.market_map = market_map # This line sets the market map that the orders trade against.
+        self.batch_size = batch_size # This line sets how many orders are validated and applied together.
+        self._symbols = sorted(market_map) # This line lists the symbols in sorted order, so each symbol has a number.
+        self._codes = {sym: i for i, sym in enumerate(self._symbols)} # This line maps each symbol to its number.
+        self._sorted = np.array(self._symbols) # This line stores the sorted symbols in an array for looking up numpy symbol columns.
+        self._lookups = {} # This line holds a hash table of the symbols for each width of numpy symbol column, built on first use.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def read_orders(stream): # This method reads (symbol, side, qty, price) orders from a CSV path or file one row at a time.
+        f = open(stream, newline="") if isinstance(stream, (str, os.PathLike)) else stream # This line opens the file if a path was given.
+        try: # This line makes sure a file opened here is closed again.
+            first = True # This line records that the header row, if there is one, has not been passed yet.
+            for row in csv.reader(f): # This line iterates over the rows of the file without reading all of it.
+                if not row: # This line checks for a blank row.
+                    continue # This line skips the blank row.
+                if first: # This line checks if this is the first row.
+                    first = False # This line records that the first row has been passed.
+                    if [c.strip().lower() for c in row[:2]] == ["symbol", "side"]: # This line checks if the first row is the header, which names the side column where an order has buy or sell.
+                        continue # This line skips the header, while an order for a SYMBOL ticker is still read.
+                yield tuple(row) + ("",) * (4 - len(row)) # This line yields the row, padding a missing price so the market price is used.
+        finally: # This line runs when the reading ends.
+            if f is not stream: # This line checks if the file was opened here.
+                f.close() # This line closes the file.
+    def _batches(self, orders): # This method splits any supported input into batches of orders.
+        if isinstance(orders, np.ndarray): # This line checks if the orders are already a numpy record array, such as one loaded with np.load(..., mmap_mode="r").
+            for start in range(0, len(orders), self.batch_size): # This line iterates over the start of each batch.
+                yield orders[start:start + self.batch_size] # This line yields a slice, which does not copy the array.
+            return # This line ends the batches.
+        if isinstance(orders, (str, os.PathLike)) or hasattr(orders, "read"): # This line checks if the orders are a CSV path or file.
+            yield from self._read_batches(orders) # This line reads the orders a batch of lines at a time.
+            return # This line ends the batches.
+        orders = iter(orders) # This line gets an iterator, so a generator is never turned into a list.
+        while True: # This line repeats until the orders run out.
+            batch = list(itertools.islice(orders, self.batch_size)) # This line takes the next batch of orders.
+            if not batch: # This line checks if there are no orders left.
+                return # This line ends the batches.
+            yield batch # This line yields the batch.
+    def _read_batches(self, stream): # This method reads a CSV path or file into batches, splitting plain lines into columns without the csv module.
+        f = open(stream, newline="") if isinstance(stream, (str, os.PathLike)) else stream # This line opens the file if a path was given.
+        try: # This line makes sure a file opened here is closed again.
+            lines = list(itertools.islice((line for line in f if line not in ("\n", "\r\n", "\r")), 1)) # This line reads the first line that is not blank.
+            if lines and [c.strip().lower() for c in next(csv.reader(lines), [])[:2]] == ["symbol", "side"]: # This line checks if the first row is the header, the same way read_orders does.
+                del lines[0] # This line skips the header.
+            lines.extend(itertools.islice(f, self.batch_size - len(lines))) # This line reads the rest of the first batch.
+            while lines: # This line repeats until the lines run out.
+                text = "".join(lines).replace("\r\n", "\n") # This line joins the lines, accepting Windows line endings.
+                if '"' in text or "\r" in text or set(map(str.count, lines, itertools.repeat(","))) != {3}: # This line checks for quoted fields, blank lines, or lines with missing or extra fields, which need the csv module.
+                    rows = (tuple(row) + ("",) * (4 - len(row)) for row in csv.reader(itertools.chain(lines, f)) if row) # This line reads the rest of the file with the csv module, padding a missing price like read_orders does.
+                    yield from self._batches(rows) # This line splits those rows into batches of the same size.
+                    return # This line ends the batches.
+                fields = (text if text.endswith("\n") else text + "\n").replace("\n", ",").split(",") # This line splits every field at once, since every line has exactly four, leaving an empty field after the last line.
+                yield _OrderColumns(fields[0:-1:4], fields[1:-1:4], fields[2:-1:4], fields[3:-1:4]) # This line yields the four columns.
+                lines = list(itertools.islice(f, self.batch_size)) # This line reads the next batch of lines.
+        finally: # This line runs when the reading ends.
+            if f is not stream: # This line checks if the file was opened here.
+                f.close() # This line closes the file.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _floats(values, n): # This method converts a column to floats, using nan for values that are missing or not numbers.
+        try: # This line attempts the fast conversion.
+            return np.fromiter(values, dtype=float, count=n) # This line converts every value at once, the same way float() does.
+        except (TypeError, ValueError): # This line handles a value that cannot be converted.
+            out = np.empty(n) # This line creates the result array.
+            for i, v in enumerate(values): # This line iterates over the values one at a time.
+                try: # This line attempts to convert the value.
+                    out[i] = float(v) # This line converts the value.
+                except (TypeError, ValueError): # This line handles a value that cannot be converted.
+                    out[i] = np.nan # This line marks the value as missing.
+            return out # This line returns the converted column.
+    MIX = np.uint64(0x9E3779B97F4A7C15) # This line is the odd constant that mixes the words of a symbol into a hash.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _words(column): # This method views a numpy text column as rows of 64-bit words, so symbols can be hashed and compared as numbers, or returns None for other columns.
+        if column.dtype.kind not in "US": # This line checks if the column does not hold fixed-width text.
+            return None # This line reports that the column cannot be viewed as words.
+        chars = column.dtype.itemsize // 4 if column.dtype.kind == "U" else column.dtype.itemsize # This line gets the width of the column in characters.
+        chars += chars % 2 # This line rounds the width up to whole words of two characters.
+        column = np.ascontiguousarray(column, dtype=f"U{chars}") # This line copies the column into one block of native text, padding with zeros.
+        return column.view(np.uint64).reshape(len(column), chars // 2) # This line returns one row of words per symbol.
+    @classmethod # This decorator indicates that the method receives the class instead of an instance.
+    def _hash(cls, words): # This method hashes each row of words into one 64-bit number.
+        h = words[:, 0].copy() # This line starts with the first word.
+        for j in range(1, words.shape[1]): # This line iterates over the other words.
+            h *= cls.MIX # This line mixes the hash so far.
+            h ^= words[:, j] # This line adds the word.
+        h *= cls.MIX # This line mixes the last word into the high bits, which pick the table slot.
+        return h # This line returns the hashes.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _same_words(a, b): # This method checks which rows of words are equal.
+        equal = np.ascontiguousarray(a == b) # This line compares every word, giving one byte per word.
+        k = equal.shape[1] # This line gets the number of words in a row.
+        if k in (1, 2, 4, 8): # This line checks if a row of bytes fits exactly in one unsigned integer.
+            return equal.view(f"u{k}")[:, 0] == int.from_bytes(b"\x01" * k, "little") # This line checks every byte of the row at once, which is much faster than numpy reducing along the short rows.
+        return equal.all(axis=1) # This line checks the rows the slower way.
+    def _lookup(self, chars): # This method returns the hash table of the symbols that fit in a column of the given width, building it on first use.
+        if chars in self._lookups: # This line checks if the table was already built.
+            return self._lookups[chars] # This line returns the table.
+        known = [sym for sym in self._symbols if type(sym) is str and len(sym) <= chars] # This line keeps the symbols that a column of this width can hold.
+        words = self._words(np.array(known, dtype=f"U{chars}")) # This line gets the words of every symbol.
+        nonzero = np.flatnonzero(words.any(axis=0)) # This line finds the words that are used by some symbol.
+        used = int(nonzero[-1]) + 1 if len(nonzero) else 1 # This line hashes only the words that some symbol uses, since any other word must be zero to match.
+        hashes = self._hash(words[:, :used]) # This line hashes every symbol.
+        if len(np.unique(hashes)) < len(known): # This line checks if two symbols share a hash, which the table cannot tell apart.
+            self._lookups[chars] = None # This line records that the slower string search must be used.
+            return None # This line reports that there is no table.
+        bits = min(max((16 * len(known)).bit_length(), 4), 22) # This line sizes the table to about sixteen slots per symbol, so few symbols share a slot.
+        slots = (hashes >> np.uint64(64 - bits)).astype(np.intp) # This line picks the slot of every symbol from the high bits of its hash.
+        table = np.full(1 << bits, -1, dtype=np.intp) # This line creates the table, where -1 marks an empty slot.
+        table[slots] = np.arange(len(known)) # This line stores the position of each symbol in its slot.
+        table[np.bincount(slots, minlength=1 << bits) > 1] = -2 # This line marks slots shared by several symbols, which are looked up by searching the sorted hashes instead.
+        by_hash = np.argsort(hashes) # This line sorts the symbols by hash for the shared slots.
+        codes = np.array([self._codes[sym] for sym in known], dtype=np.intp) # This line gets the number of every symbol.
+        self._lookups[chars] = (table, 64 - bits, used, words, codes, hashes[by_hash], by_hash) # This line stores the table.
+        return self._lookups[chars] # This line returns the table.
+    def _record_codes(self, column): # This method numbers each symbol of a numpy symbol column with the hash table, or returns None if the column cannot use it.
+        words = self._words(column) # This line gets the words of every symbol.
+        lookup = self._lookup(2 * words.shape[1]) if words is not None else None # This line gets the hash table for the width of the column.
+        if lookup is None: # This line checks if there is no table.
+            return None # This line reports that the string search must be used.
+        table, shift, used, known_words, known_codes, sorted_hashes, by_hash = lookup # This line unpacks the table.
+        if not len(known_codes): # This line checks if no symbol fits in the column.
+            return np.full(len(column), -1, dtype=np.intp) # This line marks every symbol as unknown.
+        hashes = self._hash(words[:, :used]) # This line hashes every symbol of the column.
+        found = table[(hashes >> np.uint64(shift)).astype(np.intp)] # This line gets the symbol in each slot.
+        shared = np.flatnonzero(found == -2) # This line finds the orders whose slot is shared by several symbols.
+        if len(shared): # This line checks if there are any.
+            pos = np.minimum(np.searchsorted(sorted_hashes, hashes[shared]), len(sorted_hashes) - 1) # This line searches the sorted hashes for them.
+            found[shared] = np.where(sorted_hashes[pos] == hashes[shared], by_hash[pos], -1) # This line gets the symbol with the same hash, if there is one.
+        hit = found >= 0 # This line checks which orders found a symbol.
+        candidate = np.where(hit, found, 0) # This line replaces the misses, which are rejected anyway, so they can index arrays.
+        hit &= self._same_words(words, known_words.take(candidate, axis=0)) # This line keeps only the orders whose symbol really matches, word for word.
+        return np.where(hit, known_codes[candidate], -1) # This line returns the symbol numbers, using -1 for unknown symbols.
+    def _record_signs(self, column): # This method turns a numpy side column into signs by comparing words, or returns None if the column is not text.
+        words = self._words(column) # This line gets the words of every side.
+        if words is None: # This line checks if the column is not text.
+            return None # This line reports that the string comparison must be used.
+        buy, sell = self._words(np.array(["buy", "sell"], dtype=f"U{2 * words.shape[1]}")) # This line gets the words of the two sides at the same width.
+        return self._same_words(words, buy).astype(float) - self._same_words(words, sell) # This line returns 1 for buy, -1 for sell, and 0 for unknown sides.
+    def _columns(self, batch): # This method turns a batch into arrays of symbol numbers, signs, quantities, and prices.
+        n = len(batch) # This line gets the number of orders in the batch.
+        if isinstance(batch, np.ndarray): # This line checks if the batch is a numpy record array.
+            codes = self._record_codes(batch["symbol"]) # This line numbers each symbol with the hash table.
+            if codes is None: # This line checks if the hash table cannot be used.
+                pos = np.minimum(np.searchsorted(self._sorted, batch["symbol"]), max(len(self._sorted) - 1, 0)) # This line finds where each symbol would be in the sorted symbols.
+                found = self._sorted[pos] == batch["symbol"] if len(self._sorted) else np.zeros(n, dtype=bool) # This line checks if the symbol is really there.
+                codes = np.where(found, pos, -1) # This line numbers each symbol, using -1 for unknown symbols.
+            side = batch["side"] # This line gets the side column.
+            sign = self._record_signs(side) # This line turns the side into a sign by comparing words.
+            if sign is None: # This line checks if the side column is not text.
+                sign = np.where(side == "buy", 1.0, np.where(side == "sell", -1.0, 0.0)) # This line turns the side into a sign, using 0 for unknown sides.
+            if not sign.all(): # This line checks if some sides were not written exactly as "buy" or "sell".
+                side = np.char.lower(np.char.strip(side.astype(str))) # This line normalizes the side text, which is slow, so it is only done when needed.
+                sign = np.where(side == "buy", 1.0, np.where(side == "sell", -1.0, 0.0)) # This line tries again ignoring case and spaces.
+            return codes, sign, batch["qty"].astype(float), batch["price"].astype(float) # This line returns the four columns.
+        try: # This line attempts the fast split, which works unless an order is malformed.
+            syms, sides, qtys, prices = batch.columns if isinstance(batch, _OrderColumns) else (list(map(operator.itemgetter(i), batch)) for i in range(4)) # This line splits the orders into columns, unless they were read as columns.
+            codes = np.fromiter(map(self._codes.get, syms, itertools.repeat(-1)), dtype=np.intp, count=n) # This line numbers each symbol, using -1 for unknown symbols.
+        except (IndexError, TypeError): # This line handles an order with too few fields, or a symbol that cannot be looked up.
+            return self._columns_checked(batch) # This line splits the orders one at a time, marking the malformed ones.
+        sign = np.fromiter(map(self.SIDES.get, sides, itertools.repeat(0.0)), dtype=float, count=n) # This line turns each side into a sign, using 0 for unknown sides.
+        if not sign.all(): # This line checks if some sides were not written exactly as "buy" or "sell".
+            sign = np.fromiter((self.SIDES.get(str(s).strip().lower(), 0.0) for s in sides), dtype=float, count=n) # This line tries again ignoring case and spaces.
+        return codes, sign, self._floats(qtys, n), self._floats(prices, n) # This line returns the four columns.
+    MALFORMED = -2 # This line is the symbol number given to orders that cannot be split into symbol, side, qty, and price.
+    def _columns_checked(self, batch): # This method splits a batch one order at a time, so a malformed order is rejected on its own instead of failing the whole batch.
+        rows, malformed = [], [] # This line initializes the split orders and the positions of the malformed ones.
+        for i, order in enumerate(batch): # This line iterates over the orders.
+            try: # This line attempts to split the order.
+                row = (order[0], order[1], order[2], order[3]) # This line gets the four fields.
+                hash(row[0]) # This line checks that the symbol can be looked up.
+            except (IndexError, TypeError, KeyError): # This line handles an order that is not a sequence of four fields.
+                malformed.append(i) # This line records the malformed order.
+                row = (None, None, None, None) # This line puts an empty order in its place.
+            rows.append(row) # This line adds the order.
+        codes, sign, qty, price = self._columns(rows) # This line splits the orders into columns.
+        codes[malformed] = self.MALFORMED # This line marks the malformed orders, which are always rejected.
+        return codes, sign, qty, price # This line returns the four columns.
+    def execute(self, portfolio, orders): # This method applies orders to a portfolio batch by batch and reports what happened.
+        report = {"orders": 0, "applied": 0, "batches": 0, "rolled_back": 0, "rejections": []} # This line initializes the report.
+        start = time.perf_counter() # This line starts the timer.
+        for batch in self._batches(orders): # This line iterates over the batches.
+            rejections = self._execute_batch(portfolio, batch, report["orders"]) # This line applies the batch, or rolls it back and returns why.
+            report["orders"] += len(batch) # This line counts the orders.
+            report["batches"] += 1 # This line counts the batch.
+            if rejections: # This line checks if the batch was rolled back.
+                report["rolled_back"] += 1 # This line counts the rolled back batch.
+                report["rejections"].extend(rejections) # This line adds the rejected orders to the report.
+            else: # This line handles a batch that was applied.
+                report["applied"] += len(batch) # This line counts the applied orders.
+        report["seconds"] = time.perf_counter() - start # This line records how long the run took.
+        report["orders_per_sec"] = report["orders"] / report["seconds"] if report["seconds"] else 0.0 # This line calculates the throughput.
+        return report # This line returns the report.
+    @np.errstate(invalid="ignore") # This decorator silences numpy's warnings about infinite or missing quantities and prices, whose orders are rejected anyway.
+    def _execute_batch(self, portfolio, batch, offset): # This method validates a whole batch and applies it only if every order is valid.
+        codes, sign, qty, price = self._columns(batch) # This line turns the batch into arrays.
+        missing = np.flatnonzero(np.isnan(price)) # This line finds orders without a price, which trade at the market price like Tradable.buy does.
+        for i in missing[codes[missing] >= 0].tolist(): # This line iterates over those orders with a known symbol.
+            price[i] = self.market_map[self._symbols[codes[i]]].price # This line fills in the market price.
+        finite = (qty > 0) & (qty < np.inf) & (price >= 0) & (price < np.inf) # This line checks that the quantity is a finite positive number and the price a finite number of at least zero, which is False for nan.
+        bad = (codes < 0) | (sign == 0) | ~finite # This line finds orders that are invalid on their own.
+        signed = sign * qty # This line calculates how each order changes the quantity held.
+        flow = signed * -price # This line calculates how each order changes the cash balance.
+        spent = np.cumsum(flow) # This line calculates the change in cash after each order.
+        valid = np.maximum(codes, 0) # This line replaces unknown symbol numbers, which are rejected anyway, so they can index arrays.
+        traded = np.zeros(max(len(self._symbols), 1), dtype=bool) # This line creates a flag for every symbol.
+        traded[valid] = True # This line flags the symbols traded in the batch.
+        used = np.flatnonzero(traded) # This line gets the numbers of the traded symbols.
+        inverse = (np.cumsum(traded) - 1)[valid] # This line numbers each order's symbol among the traded symbols, without sorting.
+        symbols = list(map(self._symbols.__getitem__, used.tolist())) # This line gets the traded symbols.
+        held = np.fromiter(map(portfolio.holdings.get, symbols, itertools.repeat(0)), dtype=float, count=len(symbols)) # This line gets the quantity held of each traded symbol.
+        key = inverse.astype(np.uint16) if len(used) <= 65536 else inverse # This line uses 16-bit numbers when possible, which numpy sorts with a faster radix sort.
+        order = np.argsort(key, kind="stable") # This line groups the orders by symbol, keeping their order within each symbol.
+        group = inverse[order] # This line gets the symbol of each order in grouped order.
+        grouped = signed[order] # This line gets the changes in quantity in grouped order.
+        running = np.cumsum(grouped) # This line adds up the changes across all groups.
+        starts = np.searchsorted(group, np.arange(len(used))) # This line finds where each symbol's group starts.
+        base = held - (running[starts] - grouped[starts]) # This line subtracts what earlier groups added from each symbol's quantity held, so the running total restarts at every group.
+        short = (running + base[group] < 0).any() # This line checks if any order sells more than is held at that point.
+        if short or bad.any() or spent.min(initial=0.0) < -portfolio.cash_balance: # This line checks if any order would fail, including a buy that costs more than the cash left.
+            rejections = self._explain(portfolio, batch, codes, sign, qty, price, offset) # This line replays the batch one order at a time to find exactly which orders fail.
+            if rejections: # This line checks if any order really fails.
+                return rejections # This line returns the rejections without changing the portfolio.
+        net = np.bincount(inverse, weights=signed, minlength=len(used)) # This line adds up the change in quantity of each traded symbol.
+        for sym, delta in zip(symbols, net.tolist()): # This line iterates over the traded symbols.
+            delta = int(delta) if delta.is_integer() else delta # This line keeps whole quantities as integers, like the per-order methods do.
+            if delta > 0: # This line checks if the quantity held goes up.
+                portfolio.add_position(sym, delta) # This line adds the position to the portfolio.
+            elif delta < 0: # This line checks if the quantity held goes down.
+                portfolio.remove_position(sym, -delta) # This line removes the position from the portfolio.
+        portfolio.cash_balance += float(spent[-1]) if len(spent) else 0.0 # This line applies the change in cash.
+        return [] # This line reports that the batch was applied.
+    def _explain(self, portfolio, batch, codes, sign, qty, price, offset): # This method replays a batch one order at a time on a copy of the portfolio's state and returns every rejected order.
+        cash = portfolio.cash_balance # This line copies the cash balance.
+        positions = {} # This line initializes the copied quantities, filled in as symbols are traded.
+        rejections = [] # This line initializes the list of rejected orders.
+        for i in range(len(batch)): # This line iterates over the orders in order.
+            if isinstance(batch, np.ndarray): # This line checks if the batch is a numpy record array.
+                row = tuple(batch[i].tolist()) # This line gets the order as a tuple for the report.
+            else: # This line handles a list of orders.
+                try: # This line attempts to turn the order into a tuple.
+                    row = tuple(batch[i]) # This line gets the order as a tuple for the report.
+                except TypeError: # This line handles an order that is not a sequence at all.
+                    row = batch[i] # This line reports the order as it was given.
+            if codes[i] == self.MALFORMED: # This line checks if the order could not be split into its fields.
+                reason = "Order must have symbol, side, qty, and price fields, with a symbol that can be looked up." # This line explains the rejection.
+            elif codes[i] < 0: # This line checks if the symbol is unknown.
+                reason = f"Unknown symbol {row[0]!r}." # This line explains the rejection.
+            elif sign[i] == 0: # This line checks if the side is unknown.
+                reason = f"Unknown side {row[1]!r}." # This line explains the rejection.
+            elif not 0 < qty[i] < np.inf: # This line checks if the quantity is not a finite positive number.
+                reason = f"Quantity must be a finite positive number (got {row[2]!r})." # This line explains the rejection.
+            elif not 0 <= price[i] < np.inf: # This line checks if the price is not a finite number of at least zero.
+                reason = f"Price must be a finite number of at least zero (got {row[3]!r})." # This line explains the rejection.
+            else: # This line handles an order that is valid on its own.
+                sym = self._symbols[codes[i]] # This line gets the symbol.
+                current = positions.get(sym, portfolio.holdings.get(sym, 0)) # This line gets the copied quantity held.
+                cost = qty[i] * price[i] # This line calculates the cost or revenue of the order.
+                if sign[i] > 0 and cash < cost: # This line checks if there is enough cash to buy, like Tradable.buy does.
+                    reason = f"Not enough cash (${cash:.2f}) to buy {row[2]} of {sym} (cost ${cost:.2f})." # This line explains the rejection.
+                elif sign[i] < 0 and qty[i] > current: # This line checks if there is enough to sell, like Portfolio.remove_position does.
+                    reason = f"Not enough {sym} to sell (have {current})." # This line explains the rejection.
+                else: # This line handles an order that can be applied.
+                    cash -= sign[i] * cost # This line applies the order to the copied cash.
+                    positions[sym] = current + sign[i] * qty[i] # This line applies the order to the copied quantity.
+                    continue # This line moves on to the next order.
+            rejections.append((offset + i, row, reason)) # This line records the rejected order with its position in the whole input.
+        return rejections # This line returns the rejected orders.
+_EOD_WORKER = {} # This line holds each worker process's shared memory block and its views of the shared arrays.
+def _eod_views(buf, n_symbols, n_holdings, n_portfolios): # This function views a shared memory block as the arrays published by EndOfDayRunner, without copying it.
+    layout = ( # This line lists each array with its shape and type; every element takes eight bytes.
+        ("market", (3, n_symbols), float), # This line holds the rows of prices, yields, and preferred flags.
+        ("codes", (n_holdings,), np.int64), # This line holds the symbol number of every holding, or -1 for symbols missing from the market map.
+        ("qty", (n_holdings,), float), # This line holds the quantity of every holding.
+        ("offsets", (n_portfolios + 1,), np.int64), # This line holds where each portfolio's holdings start, so portfolio i owns holdings offsets[i] to offsets[i + 1].
+        ("cash", (n_portfolios,), float), # This line holds the cash balance of every portfolio.
+    ) # Termination of the layout tuple.
+    views, pos = {}, 0 # This line initializes the views and the byte position in the block.
+    for name, shape, dtype in layout: # This line iterates over the arrays.
+        views[name] = np.ndarray(shape, dtype=dtype, buffer=buf, offset=pos) # This line views the array in the block.
+        pos += 8 * int(np.prod(shape)) # This line moves past the array.
+    return views # This line returns the views.
+def _eod_attach(shm_name, sizes): # This function attaches a worker process to the shared arrays, closing the block of an earlier run if the runner published a new one.
+    if _EOD_WORKER.get("name") == shm_name: # This line checks if the worker is already attached to the block.
+        return # This line keeps the attached block.
+    if "shm" in _EOD_WORKER: # This line checks if the worker is attached to an older block.
+        del _EOD_WORKER["views"] # This line drops the views of the older block so it can be closed.
+        _EOD_WORKER.pop("shm").close() # This line closes the older block, which the runner has already freed.
+    shm = shared_memory.SharedMemory(name=shm_name) # This line attaches to the shared memory block published by the runner.
+    _EOD_WORKER["shm"] = shm # This line keeps the block open until the runner publishes another one.
+    _EOD_WORKER["views"] = _eod_views(shm.buf, *sizes) # This line views the block as the published arrays.
+    _EOD_WORKER["name"] = shm_name # This line records which block is attached.
+def _eod_shard(task): # This function runs one shard in a worker process, attaching to the shared arrays the task names.
+    shm_name, sizes, *shard = task # This line splits the task into the block, its sizes, and the shard.
+    _eod_attach(shm_name, sizes) # This line attaches to the block, which only does work on the first shard after a new one is published.
+    return _eod_compute(_EOD_WORKER["views"], *shard) # This line runs the shard.
+def _eod_compute(views, shard_id, lo, hi): # This function runs collect_dividends, total_value, and risk_assessment for portfolios lo to hi of the shared arrays.
+    start = time.perf_counter() # This line starts the timer for the shard.
+    price, dividend_yield, preferred = views["market"] # This line gets the shared market rows.
+    offsets = views["offsets"][lo:hi + 1] # This line gets where each portfolio's holdings start, plus where the last one ends.
+    codes = views["codes"][offsets[0]:offsets[-1]] # This line gets the symbol numbers of the shard's holdings without copying them.
+    qty = views["qty"][offsets[0]:offsets[-1]] # This line gets the quantities of the shard's holdings without copying them.
+    owner = np.repeat(np.arange(hi - lo), np.diff(offsets)) # This line records which portfolio each holding belongs to.
+    listed = codes >= 0 # This line flags holdings that are in the market map, like total_value does.
+    column = np.where(listed, codes, 0) # This line replaces the numbers of missing symbols, which add nothing, so they can index the market rows.
+    value = np.where(listed, qty * price[column], 0.0) # This line calculates the value of every holding.
+    values = np.bincount(owner, weights=value, minlength=hi - lo) # This line adds up the value of each portfolio.
+    dividends = np.bincount(owner, weights=value * dividend_yield[column], minlength=hi - lo) # This line adds up the dividends of each portfolio.
+    pref = np.bincount(owner, weights=value * preferred[column], minlength=hi - lo) # This line adds up the preferred value of each portfolio.
+    cash = views["cash"][lo:hi] + dividends # This line adds the dividends to each cash balance, like collect_dividends does.
+    worth = values + cash # This line calculates the total value of each portfolio including cash, like risk_assessment does.
+    risk = ["N/A" if w == 0 else f"{p / w * 100:.1f}% preferred holdings" for p, w in zip(pref.tolist(), worth.tolist())] # This line formats the risk assessment of each portfolio.
+    return shard_id, values, dividends, cash, risk, os.getpid(), time.perf_counter() - start # This line returns the results and how long the shard took.
+class EndOfDayRunner: # This defines a new class called EndOfDayRunner that runs the end-of-day calculations for many portfolios across a process pool.
+    def __init__(self, market_map, processes=None, shard_size=2_000): # This is the constructor method that initializes the class.
+        self.market_map = market_map # This line sets the market map whose prices and yields are shared with the workers.
+        self.processes = processes or os.cpu_count() or 1 # This line sets the number of worker processes, defaulting to one per core.
+        self.shard_size = shard_size # This line sets how many portfolios a worker runs at a time.
+        self._pool = None # This line holds the process pool, started on the first run and kept for later runs.
+        self._book = None # This line holds the shared memory block of the last run with what it was published from, so unchanged holdings are not published again.
+    def __enter__(self): # This method lets the runner be used in a with statement.
+        return self # This line returns the runner.
+    def __exit__(self, *exc): # This method releases the runner at the end of a with statement.
+        self.close() # This line stops the pool and frees the block.
+    def close(self): # This method stops the process pool and frees the shared memory block.
+        if self._pool is not None: # This line checks if a pool was started.
+            self._pool.terminate() # This line stops the worker processes.
+            self._pool.join() # This line waits for them to exit.
+            self._pool = None # This line forgets the pool.
+        self._discard() # This line frees the block.
+    def _discard(self): # This method frees the shared memory block of the last run, if there is one.
+        if self._book is not None: # This line checks if there is a block.
+            shm = self._book[0] # This line gets the block.
+            self._book = None # This line forgets the block first, so it is not freed twice.
+            shm.unlink() # This line frees the block once every process has closed it.
+            try: # This line attempts to close the runner's view of the block.
+                shm.close() # This line closes the runner's view of the block.
+            except BufferError: # This line handles a view still held by the traceback of a failed shard.
+                pass # This line leaves the view to be closed when it is garbage collected, so the original error is not hidden.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _snapshot(holdings): # This method copies holdings, so a later run can check cheaply if they changed.
+        if isinstance(holdings, ColumnarHoldings): # This line checks if the holdings are stored in arrays.
+            return list(holdings._symbols), holdings.qty[:len(holdings)].copy() # This line copies the symbols and quantities.
+        return dict(holdings) # This line copies the dictionary.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _unchanged(holdings, snapshot): # This method checks if holdings still match their snapshot.
+        if isinstance(holdings, ColumnarHoldings): # This line checks if the holdings are stored in arrays.
+            return isinstance(snapshot, tuple) and holdings._symbols == snapshot[0] and np.array_equal(holdings.qty[:len(holdings)], snapshot[1]) # This line compares the symbols and quantities.
+        return isinstance(snapshot, dict) and holdings == snapshot # This line compares the dictionaries, which Python does without running any Python code per holding.
+    def _reusable(self, portfolios, symbols): # This method checks if the last block was published from the same portfolios, holdings, and market symbols.
+        if self._book is None: # This line checks if nothing was published yet.
+            return False # This line reports that the holdings must be published.
+        _, _, old_symbols, old_portfolios, snapshots = self._book # This line gets what the block was published from.
+        return ( # This line returns whether every part matches.
+            len(portfolios) == len(old_portfolios) and all(map(operator.is_, portfolios, old_portfolios)) # This line checks that the portfolios are the same objects in the same order.
+            and symbols == old_symbols # This line checks that the symbols, and so their numbers, are the same.
+            and all(map(self._unchanged, (p.holdings for p in portfolios), snapshots)) # This line checks that no holdings changed.
+        ) # Termination of the check.
+    def _publish(self, portfolios): # This method copies the market and every portfolio's holdings and cash into shared memory, reusing the last block if the holdings did not change.
+        symbols = list(self.market_map) # This line lists the symbols in the order of their columns in the market rows.
+        if self._reusable(portfolios, symbols): # This line checks if the holdings published last time still hold.
+            shm, sizes = self._book[:2] # This line reuses the block.
+            views = _eod_views(shm.buf, *sizes) # This line views the block as the arrays.
+            self._fill_market(views["market"], symbols) # This line stores the current prices, yields, and preferred flags.
+            views["cash"][:] = np.fromiter((p.cash_balance for p in portfolios), dtype=float, count=sizes[2]) # This line stores every cash balance.
+            views.clear() # This line drops the views so the block can be closed later.
+            return shm, sizes, True # This line returns the block, its sizes, and that the holdings were reused.
+        self._discard() # This line frees the block of the last run, whose holdings are out of date.
+        codes = {sym: i for i, sym in enumerate(symbols)} # This line numbers each symbol by its column in the market rows.
+        holdings = [p.holdings for p in portfolios] # This line gets the holdings of every portfolio.
+        lengths = np.fromiter(map(len, holdings), dtype=np.int64, count=len(holdings)) # This line gets the number of holdings of each portfolio.
+        sizes = (max(len(codes), 1), int(lengths.sum()), len(portfolios)) # This line gets the sizes of the arrays, with at least one market column so missing symbols can index it.
+        shm = shared_memory.SharedMemory(create=True, size=max(8 * (3 * sizes[0] + 2 * sizes[1] + 2 * sizes[2] + 1), 1)) # This line creates a block big enough for every array.
+        try: # This line makes sure the block is freed if filling it fails.
+            views = _eod_views(shm.buf, *sizes) # This line views the block as the arrays.
+            self._fill_market(views["market"], symbols) # This line stores the prices, yields, and preferred flags.
+            views["codes"][:] = np.fromiter(map(codes.get, itertools.chain.from_iterable(holdings), itertools.repeat(-1)), dtype=np.int64, count=sizes[1]) # This line numbers every held symbol in one pass, using -1 for symbols missing from the market map.
+            views["qty"][:] = np.fromiter(itertools.chain.from_iterable(h.qty[:len(h)] if isinstance(h, ColumnarHoldings) else h.values() for h in holdings), dtype=float, count=sizes[1]) # This line stores every quantity held in one pass, reading array-backed holdings straight from their array.
+            views["offsets"][0] = 0 # This line starts the first portfolio's holdings at zero.
+            np.cumsum(lengths, out=views["offsets"][1:]) # This line records where each following portfolio's holdings start.
+            views["cash"][:] = np.fromiter((p.cash_balance for p in portfolios), dtype=float, count=sizes[2]) # This line stores every cash balance.
+            views.clear() # This line drops the views so the block can be closed later.
+        except BaseException: # This line handles a failure while filling the block.
+            shm.unlink() # This line frees the block.
+            raise # This line passes the error on.
+        self._book = (shm, sizes, symbols, portfolios, list(map(self._snapshot, holdings))) # This line keeps the block with what it was published from, for the next run.
+        return shm, sizes, False # This line returns the block, its sizes, and that the holdings were published.
+    def _fill_market(self, market, symbols): # This method stores the price, yield, and preferred flag of every market entity in the market rows.
+        market[:] = 0.0 # This line clears the market rows, including the spare column of an empty market map.
+        for i, sym in enumerate(symbols): # This line iterates over the market entities.
+            entity = self.market_map[sym] # This line gets the market entity.
+            market[0, i] = entity.price # This line stores the price.
+            market[1, i] = entity.dividend_yield if isinstance(entity, DividendPaying) else 0.0 # This line stores the yield, which is zero for entities that do not pay dividends.
+            market[2, i] = 1.0 if isinstance(entity, PreferredStock) else 0.0 # This line stores whether the entity is a preferred stock.
+    def run(self, portfolios): # This method runs collect_dividends, total_value, and risk_assessment for every portfolio and applies the new cash balances.
+        timings = {} # This line initializes the run timings.
+        start = time.perf_counter() # This line starts the timer for the whole run.
+        portfolios = list(portfolios) # This line makes a list, since the results are matched back to the portfolios by position.
+        shm, sizes, timings["reused"] = self._publish(portfolios) # This line publishes the market and cash, and the holdings unless they are unchanged since the last run, so each task only names a range of portfolios.
+        timings["publish"] = time.perf_counter() - start # This line records the time spent publishing.
+        compute_start = time.perf_counter() # This line starts the timer for the shards, after publishing.
+        tasks = [(i, lo, min(lo + self.shard_size, len(portfolios))) for i, lo in enumerate(range(0, len(portfolios), self.shard_size))] # This line builds one small task per shard, holding only the shard number and its range of portfolios.
+        if self.processes == 1: # This line checks if only one process was asked for.
+            views = _eod_views(shm.buf, *sizes) # This line views the block in the current process instead of starting a pool.
+            try: # This line makes sure the views are dropped even if a shard fails.
+                results = [_eod_compute(views, *t) for t in tasks] # This line runs every shard in the current process.
+            finally: # This line runs after the shards.
+                views.clear() # This line drops the views so the block can be closed.
+        else: # This line handles more than one process.
+            if self._pool is None: # This line checks if the pool has not been started yet.
+                self._pool = multiprocessing.Pool(self.processes) # This line starts the process pool, which later runs reuse.
+            results = list(self._pool.imap_unordered(_eod_shard, [(shm.name, sizes, *t) for t in tasks])) # This line runs the shards and gathers results as they finish.
+        timings["compute"] = time.perf_counter() - compute_start # This line records the time spent until every shard finished.
+        results.sort(key=operator.itemgetter(0)) # This line puts the shards back in order.
+        out = {"values": [], "dividends": [], "cash": [], "risk": []} # This line initializes the gathered results.
+        for _, values, dividends, cash, risk, _, _ in results: # This line iterates over the shard results.
+            out["values"].extend(values.tolist()) # This line gathers the total values.
+            out["dividends"].extend(dividends.tolist()) # This line gathers the dividends collected.
+            out["cash"].extend(cash.tolist()) # This line gathers the new cash balances.
+            out["risk"].extend(risk) # This line gathers the risk assessments.
+        for portfolio, cash in zip(portfolios, out["cash"]): # This line iterates over the portfolios and their new cash balances.
+            portfolio.cash_balance = cash # This line applies the collected dividends to the portfolio.
+        timings["total"] = time.perf_counter() - start # This line records the time for the whole run.
+        timings["shards"] = [(r[0], r[5], r[6]) for r in results] # This line records which process ran each shard and how long it took.
+        out["timings"] = timings # This line adds the timings to the results.
+        return out # This line returns the results.
+class MarketFeed: # This defines a new class called MarketFeed that applies live price ticks to the market entities with asyncio.
+    def __init__(self, market_map, flush_interval=0.01, max_pending=10_000, max_samples=100_000): # This is the constructor method that initializes the class.
+        self.market_map = market_map # This line sets the market map whose prices are updated.
+        self.flush_interval = flush_interval # This line sets how often waiting ticks are applied, in seconds.
+        self.max_pending = max_pending # This line sets how many symbols may wait before they are applied early.
+        self._pending = {} # This line holds the latest waiting price of each symbol, so a burst of ticks becomes one update.
+        self._subscribers = [] # This line initializes the subscribers notified after each batch.
+        self._latencies = collections.deque(maxlen=max_samples) # This line keeps the most recent tick-to-update latencies in nanoseconds.
+        self._wake = None # This line holds the event that asks for an early flush, created inside the event loop.
+        self.counts = {"ticks": 0, "updates": 0, "batches": 0, "unknown": 0, "bad": 0, "subscriber_errors": 0} # This line counts what the feed has done.
+        self._started = None # This line holds the time the feed started.
+    def subscribe(self, subscriber): # This method registers a portfolio, or any function taking the set of updated symbols, to be notified after each batch.
+        self._subscribers.append(subscriber) # This line adds the subscriber.
+    def feed_tick(self, symbol, price, sent_ns=None): # This method queues one price tick.
+        self.counts["ticks"] += 1 # This line counts the tick.
+        self._pending[symbol] = (price, sent_ns or time.time_ns()) # This line keeps only the latest price of the symbol.
+        if len(self._pending) >= self.max_pending and self._wake is not None: # This line checks if too many symbols are waiting.
+            self._wake.set() # This line asks for the waiting ticks to be applied now.
+    def _parse(self, line): # This method reads a "symbol,price[,sent_ns]" tick and queues it.
+        parts = line.strip().split(",") # This line splits the tick into fields.
+        try: # This line attempts to read the fields.
+            price = float(parts[1]) # This line reads the price.
+            if not (math.isfinite(price) and price >= 0): # This line checks for a price that is nan, infinite, or negative.
+                raise ValueError(f"Bad price {price!r}") # This line rejects the price, so it is counted as a bad tick.
+            self.feed_tick(parts[0], price, int(parts[2]) if len(parts) > 2 and parts[2] else None) # This line queues the tick.
+        except (IndexError, ValueError): # This line handles a tick that cannot be read or has a bad price.
+            if parts != [""]: # This line ignores blank lines.
+                self.counts["bad"] += 1 # This line counts the bad tick.
+    def flush(self): # This method applies every waiting tick to its market entity and notifies the subscribers.
+        if not self._pending: # This line checks if nothing is waiting.
+            return set() # This line returns no updated symbols.
+        batch, self._pending = self._pending, {} # This line takes the waiting ticks and starts a new batch.
+        updated = set() # This line initializes the set of updated symbols.
+        for sym, (price, sent_ns) in batch.items(): # This line iterates over the waiting ticks.
+            entity = self.market_map.get(sym) # This line gets the market entity.
+            if entity is None: # This line checks if the symbol is not in the market map.
+                self.counts["unknown"] += 1 # This line counts the unknown symbol.
+                continue # This line moves on to the next tick.
+            entity.price = price # This line sets the price, which also updates any tracking PremiumPortfolio.
+            updated.add(sym) # This line records the updated symbol.
+        done = time.time_ns() # This line gets the time the prices were applied.
+        self._latencies.extend(done - batch[sym][1] for sym in updated) # This line records the tick-to-update latency of each applied tick.
+        self.counts["updates"] += len(updated) # This line counts the updates.
+        self.counts["batches"] += 1 # This line counts the batch.
+        for subscriber in self._subscribers: # This line iterates over the subscribers.
+            try: # This line attempts to notify the subscriber, so one failing subscriber does not stop the others or the flusher.
+                if isinstance(subscriber, Portfolio): # This line checks if the subscriber is a portfolio.
+                    subscriber.revalue(self.market_map, updated) # This line lets the portfolio revalue.
+                else: # This line handles a function.
+                    subscriber(updated) # This line calls the function with the updated symbols.
+            except Exception as e: # This line handles any exceptions raised by the subscriber.
+                self.counts["subscriber_errors"] += 1 # This line counts the error.
+                print(f"Subscriber {subscriber!r} failed: {e!r}", file=sys.stderr) # This line logs the error.
+        return updated # This line returns the updated symbols.
+    async def _flusher(self): # This method applies the waiting ticks every flush interval, or early when too many are waiting.
+        while True: # This line repeats until the feed stops.
+            try: # This line waits for the next flush.
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval) # This line waits for the interval or an early wake-up.
+            except asyncio.TimeoutError: # This line handles the interval passing.
+                pass # This line goes on to flush.
+            self._wake.clear() # This line resets the early wake-up.
+            self.flush() # This line applies the waiting ticks.
+    async def _open(self, source): # This method opens a tick source and returns a stream reader and what must be closed when reading ends.
+        kind, _, target = source.partition(":") # This line splits the source into its kind and target.
+        if kind == "unix": # This line checks for a local socket.
+            return await asyncio.open_unix_connection(target) # This line connects to the socket, returning its writer to be closed.
+        elif kind == "tcp": # This line checks for a local TCP port.
+            host, _, port = target.rpartition(":") # This line splits the host and port.
+            return await asyncio.open_connection(host or "127.0.0.1", int(port)) # This line connects to the port, returning its writer to be closed.
+        elif kind == "pipe": # This line checks for a pipe, where "-" means standard input.
+            pipe = open(os.dup(sys.stdin.fileno()) if target in ("", "-") else target, "rb", buffering=0) # This line opens the pipe, using a copy of standard input so closing it leaves standard input open.
+            reader = asyncio.StreamReader() # This line creates the reader.
+            try: # This line makes sure the pipe is closed if it cannot be connected.
+                transport, _ = await asyncio.get_running_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe) # This line connects the pipe to the reader.
+            except BaseException: # This line handles a file that is not a pipe, among other failures.
+                pipe.close() # This line closes the pipe.
+                raise # This line passes the error on.
+            return reader, transport # This line returns the reader and the transport, which closes the pipe.
+        raise ValueError(f"Unknown feed source {source!r}; use unix:PATH, tcp:HOST:PORT, pipe:PATH, or replay:PATH.") # This line raises an error naming the supported sources.
+    async def run(self, source, duration=None): # This method reads ticks from a source until it ends or the duration passes, and returns the feed statistics.
+        self._wake = asyncio.Event() # This line creates the early wake-up event inside the running loop.
+        self._started = time.perf_counter() # This line starts the timer.
+        flusher = asyncio.create_task(self._flusher()) # This line starts applying ticks in the background.
+        closer = None # This line holds the socket writer or pipe transport, which must stay referenced until reading ends and is then closed.
+        try: # This line makes sure the flusher always stops.
+            if source.startswith("replay:"): # This line checks for a replay file.
+                reading = self._replay(source[len("replay:"):]) # This line reads the ticks from the file.
+            else: # This line handles a socket or a pipe.
+                reader, closer = await self._open(source) # This line opens the source.
+                reading = self._read(reader) # This line reads the ticks from the stream.
+            await (asyncio.wait_for(reading, duration) if duration else reading) # This line reads the ticks until the source ends or the duration passes.
+        except asyncio.TimeoutError: # This line handles the duration passing.
+            pass # This line stops reading.
+        finally: # This line runs when reading ends.
+            flusher.cancel() # This line stops the flusher.
+            if closer is not None: # This line checks if a socket or pipe was opened.
+                closer.close() # This line closes the connection or the pipe.
+                await asyncio.sleep(0) # This line lets the event loop finish closing it.
+            self.flush() # This line applies the last waiting ticks.
+        return self.stats() # This line returns the statistics.
+    async def _read(self, reader): # This method reads ticks from a stream until it ends.
+        async for line in reader: # This line iterates over the lines as they arrive.
+            self._parse(line.decode()) # This line queues the tick.
+    async def _replay(self, path, chunk=1_000): # This method reads ticks from a replay file, giving the event loop a turn every chunk of lines.
+        with open(path, encoding="utf-8") as f: # This line opens the replay file.
+            for i, line in enumerate(f): # This line iterates over the lines of the file without reading all of it.
+                self._parse(line.rsplit(",", 1)[0] if line.count(",") > 1 else line) # This line queues the tick, dropping its recorded send time so latency is measured from when it was read.
+                if i % chunk == 0: # This line checks if a chunk has been read.
+                    await asyncio.sleep(0) # This line lets the flusher run.
+    def stats(self): # This method returns the feed counts, throughput, and latency percentiles.
+        elapsed = time.perf_counter() - self._started if self._started else 0.0 # This line gets how long the feed has run.
+        samples = sorted(self._latencies) # This line sorts the latencies for the percentiles.
+        pct = lambda q: samples[min(int(q * len(samples)), len(samples) - 1)] / 1e6 if samples else float("nan") # This line returns a percentile of the latency in milliseconds.
+        return dict(self.counts, seconds=elapsed, ticks_per_sec=self.counts["ticks"] / elapsed if elapsed else 0.0, latency_ms={"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": pct(1.0)}) # This line returns the statistics.
+async def simulate_exchange(address, symbols, rate=100_000, duration=10.0, seed=0): # This function stands in for the exchange by serving random-walk price ticks on a local socket.
+    rng = random.Random(seed) # This line creates a seeded random generator.
+    prices = {s: rng.uniform(10, 500) for s in symbols} # This line picks a starting price for each symbol.
+    names = list(symbols) # This line lists the symbols to pick from.
+    done = asyncio.Event() # This line creates the event set when the simulation ends.
+    async def serve(reader, writer): # This function sends ticks to one connected feed.
+        end = time.perf_counter() + duration # This line gets the time to stop.
+        per_ms = max(rate // 1000, 1) # This line gets how many ticks are sent every millisecond.
+        while time.perf_counter() < end and not writer.is_closing(): # This line repeats until the duration passes or the feed disconnects.
+            now = time.time_ns() # This line gets the send time written into the ticks.
+            lines = [] # This line initializes the ticks sent in this burst.
+            for sym in rng.choices(names, k=per_ms): # This line picks the symbols that tick.
+                prices[sym] = max(prices[sym] * (1 + rng.gauss(0, 0.001)), 0.01) # This line moves the price a little.
+                lines.append(f"{sym},{prices[sym]:.4f},{now}\n") # This line writes the tick.
+            writer.write("".join(lines).encode()) # This line sends the burst.
+            try: # This line attempts to wait for the burst to be sent.
+                await writer.drain() # This line waits if the feed is reading slower than the ticks are sent.
+            except ConnectionError: # This line handles the feed disconnecting.
+                break # This line stops sending.
+            await asyncio.sleep(0.001) # This line waits a millisecond before the next burst.
+        writer.close() # This line closes the connection, which ends the feed.
+        done.set() # This line ends the simulation.
+    if address.startswith("tcp:"): # This line checks for a TCP port.
+        host, _, port = address[len("tcp:"):].rpartition(":") # This line splits the host and port.
+        server = await asyncio.start_server(serve, host or "127.0.0.1", int(port)) # This line starts serving on the port.
+    else: # This line handles a local socket.
+        server = await asyncio.start_unix_server(serve, address[len("unix:"):] if address.startswith("unix:") else address) # This line starts serving on the socket.
+    async with server: # This line keeps the server open until the simulation ends.
+        await done.wait() # This line waits for the simulation to end.
 class StockApp(tk.Tk): # This defines a new class called StockApp that inherits from tk.Tk, which is the main window class in tkinter.
-    def __init__(self, market_map, portfolio): # This is the constructor method that initializes the class.
+    MAX_LISTED = 500 # This line sets how many matching symbols the listbox shows at once, so large markets do not fill it.
+    POLL_MS = 20 # This line sets how often the main thread picks up results from the background worker.
+    LOG_FLUSH_MS = 50 # This line sets how long log messages are collected before they are written to the text area together.
+    MAX_LOG_LINES = 5_000 # This line sets how many lines the text area keeps.
+    def __init__(self, market_map, portfolio, background=True): # This is the constructor method that initializes the class.
         super().__init__() # This line initializes the parent class (tk.Tk).
         self.title("Hybrid Inheritance Stock App") # This line sets the title of the window.
         self.market_map = market_map # This line sets the market map for the application.
         self.portfolio = portfolio # This line sets the portfolio for the application.
+        self.background = background # This line sets whether portfolio work runs on a background thread instead of the Tk main thread.
+        self._symbols = list(market_map) # This line keeps the symbols in order for filtering.
+        self._jobs = queue.Queue() # This line initializes the queue of work for the background thread.
+        self._results = queue.Queue() # This line initializes the queue of finished work for the main thread.
+        self._pending_log = [] # This line initializes the log messages waiting to be written.
+        self._filter_job = None # This line holds the scheduled filter update, if one is waiting.
         self._build_ui() # This line calls the method to build the user interface.
+        if background: # This line checks if the background thread is used.
+            threading.Thread(target=self._work, daemon=True).start() # This line starts the background thread, which runs every portfolio operation in order.
+            self.after(self.POLL_MS, self._drain) # This line starts picking up results on the main thread.
+        self.protocol("WM_DELETE_WINDOW", self._close) # This line stops the background thread when the window is closed.
+    def _work(self): # This method runs on the background thread and does the portfolio work one job at a time.
+        while True: # This line repeats until the window is closed.
+            job = self._jobs.get() # This line waits for the next job.
+            if job is None: # This line checks if the window was closed.
+                return # This line ends the thread.
+            fn, on_done, on_error = job # This line unpacks the job.
+            try: # This line attempts the work.
+                self._results.put((on_done, fn())) # This line sends the result back to the main thread.
+            except Exception as e: # This line handles any exceptions that occur during the work.
+                self._results.put((on_error, e)) # This line sends the error back to the main thread.
+    def _drain(self): # This method runs on the main thread and calls back with every finished result.
+        while True: # This line repeats until there are no more results.
+            try: # This line attempts to get a result.
+                callback, value = self._results.get_nowait() # This line gets the next result without waiting.
+            except queue.Empty: # This line handles there being no more results.
+                break # This line stops looking for results.
+            callback(value) # This line calls back with the result, on the main thread where Tk can be used safely.
+        self.after(self.POLL_MS, self._drain) # This line checks for results again later.
+    def _submit(self, fn, on_done, on_error=None): # This method runs work on the background thread and calls back on the main thread.
+        on_error = on_error or self._show_error # This line shows an error message if no other handler was given.
+        if not self.background: # This line checks if the background thread is not used.
+            try: # This line attempts the work.
+                result = fn() # This line does the work on the main thread.
+            except Exception as e: # This line handles any exceptions that occur during the work.
+                on_error(e) # This line handles the error.
+            else: # This line handles work that succeeded.
+                on_done(result) # This line handles the result.
+            return # This line ends the method.
+        self._jobs.put((fn, on_done, on_error)) # This line queues the work.
+    def _show_error(self, e): # This method shows an error from the background thread.
+        messagebox.showerror("Error", str(e)) # This line shows an error message.
+    def _close(self): # This method closes the window.
+        self._jobs.put(None) # This line tells the background thread to stop.
+        self.destroy() # This line closes the window.
     def _build_ui(self): # This method builds the user interface for the application.
         tk.Label(self, text="Market Symbols:").grid(row=0, column=0) # This line creates a label for the market symbols.
+        self.filter_text = tk.StringVar() # This line holds the text used to filter the market symbols.
+        self.filter_text.trace_add("write", lambda *_: self._schedule_filter()) # This line updates the listbox shortly after the filter text changes.
+        tk.Entry(self, textvariable=self.filter_text).grid(row=1, column=0, padx=5) # This line creates an entry field for filtering the market symbols.
         self.lst = tk.Listbox(self, height=6) # This line creates a listbox to display the market symbols.
-        for sym in self.market_map: # This line iterates over the market map.
-            self.lst.insert(tk.END, sym) # This line inserts the market symbols into the listbox.
-        self.lst.grid(row=1, column=0, rowspan=6, padx=5, pady=5) # This line places the listbox in the grid.
+        self.lst.grid(row=2, column=0, rowspan=5, padx=5, pady=5) # This line places the listbox in the grid.
         tk.Label(self, text="Qty / Amt:").grid(row=0, column=1) # This line creates a label for the quantity or amount.
         self.qty = tk.Entry(self) # This line creates an entry field for the quantity or amount.
         self.qty.grid(row=1, column=1, padx=5) # This line places the entry field in the grid.
@@ -112,8 +1220,24 @@ class StockApp(tk.Tk): # This defines a new class called StockApp that inherits
         # The line below creates a button to show the risk assessment of the portfolio.
         tk.Button(self, text="Risk Assessment",   command=self._show_risk)\
             .grid(row=9, column=0, columnspan=2, sticky="we") # This line creates a button to show the risk assessment of the portfolio.
+        self.listed = tk.Label(self, text="") # This line creates a label showing how many symbols match the filter.
+        self.listed.grid(row=10, column=0, columnspan=2) # This line places the label in the grid.
+        self._apply_filter() # This line fills the listbox with the first market symbols.
         self.output = tk.Text(self, height=10) # This line creates a text area to display output messages.
         self.output.grid(row=1, column=2, rowspan=9, padx=5, pady=5) # This line places the text area in the grid.
+    def _schedule_filter(self): # This method waits for typing to pause before filtering, so each key press does not refill the listbox.
+        if self._filter_job is not None: # This line checks if a filter update is already waiting.
+            self.after_cancel(self._filter_job) # This line cancels it.
+        self._filter_job = self.after(150, self._apply_filter) # This line schedules the filter update.
+    def _apply_filter(self): # This method shows the symbols that match the filter text.
+        self._filter_job = None # This line clears the scheduled filter update.
+        text = self.filter_text.get().strip().upper() # This line gets the filter text.
+        matches = [s for s in self._symbols if text in s.upper()] if text else self._symbols # This line finds the matching symbols.
+        self.lst.delete(0, tk.END) # This line empties the listbox.
+        self.lst.insert(tk.END, *matches[:self.MAX_LISTED]) # This line inserts the first matching symbols with a single call.
+        self.listed.config(text=f"Showing {min(len(matches), self.MAX_LISTED):,} of {len(matches):,} matching symbols") # This line shows how many symbols match.
+    def _selected_symbol(self): # This method returns the selected market symbol.
+        return self.lst.get(tk.ACTIVE) # This line gets the selected market symbol from the listbox.
     def _get_qty(self): # This method retrieves the quantity or amount entered by the user.
         val = self.qty.get() # This line gets the value from the entry field.
         try: # This line attempts to convert the value to a number.
@@ -130,54 +1254,277 @@ class StockApp(tk.Tk): # This defines a new class called StockApp that inherits
     def _buy(self): # This method handles the buying of stocks.
         q = self._get_qty() # This line retrieves the quantity or amount entered by the user.
         if q is None: return # This line checks if the quantity is None.
-        sym = self.lst.get(tk.ACTIVE) # This line gets the selected market symbol from the listbox.
-        try: # This line attempts to buy the stock.
-            self.market_map[sym].buy(self.portfolio, q) # This line calls the buy method of the selected stock.
-            self._log(f"Bought {q} of {sym}") # This line logs the purchase.
-        except Exception as e: # This line handles any exceptions that occur during the purchase.
-            messagebox.showerror("Error", str(e)) # This line shows an error message if the purchase fails.
+        sym = self._selected_symbol() # This line gets the selected market symbol from the listbox.
+        self._submit(lambda: self.market_map[sym].buy(self.portfolio, q), lambda _: self._log(f"Bought {q} of {sym}")) # This line buys the stock on the background thread and logs the purchase, or shows an error message if it fails.
     def _sell(self): # This method handles the selling of stocks.
         q = self._get_qty() # This line retrieves the quantity or amount entered by the user.
         if q is None: return # This line checks if the quantity is None.
-        sym = self.lst.get(tk.ACTIVE) # This line gets the selected market symbol from the listbox.
-        try: # This line attempts to sell the stock.
-            self.market_map[sym].sell(self.portfolio, q) # This line calls the sell method of the selected stock.
-            self._log(f"Sold {q} of {sym}") # This line logs the sale.
-        except Exception as e: # This line handles any exceptions that occur during the sale.
-            messagebox.showerror("Error", str(e)) # This line shows an error message if the sale fails.
+        sym = self._selected_symbol() # This line gets the selected market symbol from the listbox.
+        self._submit(lambda: self.market_map[sym].sell(self.portfolio, q), lambda _: self._log(f"Sold {q} of {sym}")) # This line sells the stock on the background thread and logs the sale, or shows an error message if it fails.
     def _deposit_cash(self): # This method handles the depositing of cash into the portfolio.
         amt = self._get_qty() # This line retrieves the quantity or amount entered by the user.
         if amt is None: return # This line checks if the amount is None.
-        try: # This line attempts to deposit the cash.
-            self.portfolio.deposit_cash(amt) # This line calls the deposit_cash method of the portfolio.
-            self._log(f"Deposited cash: ${amt:.2f}") # This line logs the deposit. 
-        except Exception as e: # This line handles any exceptions that occur during the deposit.
-            messagebox.showerror("Error", str(e)) # This line shows an error message if the deposit fails.
+        self._submit(lambda: self.portfolio.deposit_cash(amt), lambda _: self._log(f"Deposited cash: ${amt:.2f}")) # This line deposits the cash on the background thread and logs the deposit, or shows an error message if it fails.
     def _show_cash(self): # This method handles the displaying of the cash balance.
-        cb = self.portfolio.display_cash() # This line retrieves the cash balance from the portfolio.
-        self._log(f"Cash balance: ${cb:,.2f}") # This line logs the cash balance.
+        self._submit(self.portfolio.display_cash, lambda cb: self._log(f"Cash balance: ${cb:,.2f}")) # This line retrieves the cash balance and logs it.
     def _collect_dividends(self): # This method handles the collecting of dividends from the portfolio.
-        total = self.portfolio.collect_dividends(self.market_map) # This line collects dividends from the portfolio.
-        self._log(f"Collected dividends: ${total:.2f}") # This line logs the total dividends collected.
+        self._submit(lambda: self.portfolio.collect_dividends(self.market_map), lambda total: self._log(f"Collected dividends: ${total:.2f}")) # This line collects dividends on the background thread and logs the total.
     def _show_portfolio(self): # This method handles the displaying of the portfolio.
-        pos = self.portfolio.view_positions() # This line retrieves the current positions in the portfolio.
-        self._log(f"Holdings: {pos}") # This line logs the current positions in the portfolio.
+        self._submit(lambda: str(self.portfolio.view_positions()), lambda pos: self._log(f"Holdings: {pos}")) # This line retrieves and formats the current positions on the background thread and logs them.
     def _show_value(self): # This method handles the displaying of the total value of the portfolio.
-        val = self.portfolio.total_value(self.market_map) # This line calculates the total value of the portfolio.
-        self._log(f"Total portfolio value (excl. cash): ${val:,.2f}") # This line logs the total value of the portfolio.
+        self._submit(lambda: self.portfolio.total_value(self.market_map), lambda val: self._log(f"Total portfolio value (excl. cash): ${val:,.2f}")) # This line calculates the total value on the background thread and logs it.
     def _show_risk(self): # This method handles the displaying of the risk assessment of the portfolio.
-        r = self.portfolio.risk_assessment(self.market_map) # This line assesses the risk of the portfolio.
-        self._log(f"Risk assessment: {r}") # This line logs the risk assessment of the portfolio.
+        self._submit(lambda: self.portfolio.risk_assessment(self.market_map), lambda r: self._log(f"Risk assessment: {r}")) # This line assesses the risk on the background thread and logs it.
     def _log(self, msg): # This method handles logging messages to the output text area.
-        self.output.insert(tk.END, msg + "\n") # This line inserts the message into the text area.
+        if not self._pending_log: # This line checks if this is the first message since the last write.
+            self.after(self.LOG_FLUSH_MS, self._flush_log) # This line schedules a single write for every message logged until then.
+        self._pending_log.append(msg) # This line adds the message to the waiting messages.
+    def _flush_log(self): # This method writes the waiting log messages to the text area.
+        text, self._pending_log = "\n".join(self._pending_log) + "\n", [] # This line joins the waiting messages and empties the list.
+        self.output.insert(tk.END, text) # This line inserts every message with a single call.
+        lines = int(self.output.index("end-1c").split(".")[0]) # This line gets the number of lines in the text area.
+        if lines > self.MAX_LOG_LINES: # This line checks if the text area has too many lines.
+            self.output.delete("1.0", f"{lines - self.MAX_LOG_LINES}.0") # This line removes the oldest lines.
         self.output.see(tk.END) # This line scrolls the text area to the end to show the latest message.
+def check_orders(n_trials=300, seed=0): # This function checks the OrderExecutor against a replay of random valid and invalid orders one at a time, for every input format.
+    rng = random.Random(seed) # This line creates a seeded random generator, so every run checks the same orders.
+    market_map = MarketMap({f"S{i:02d}": CommonStock(f"S{i:02d}", rng.uniform(1, 100)) for i in range(20)}) # This line creates the market entities.
+    def number(v): # This function converts a field the way the executor does, using nan for values that are not numbers.
+        try: # This line attempts the conversion.
+            return float(v) # This line converts the field.
+        except (TypeError, ValueError): # This line handles a field that is not a number.
+            return math.nan # This line marks the field as missing.
+    def replay(cash, holdings, orders, batch_size): # This function applies orders one at a time, rolling back every batch that has a rejected order, and returns the rejected positions.
+        rejected = [] # This line initializes the rejected positions.
+        for start in range(0, len(orders), batch_size): # This line iterates over the batches.
+            c, h, failed = cash, dict(holdings), [] # This line copies the state for the batch.
+            for i, (sym, side, q, p) in enumerate(orders[start:start + batch_size], start): # This line iterates over the orders of the batch.
+                side = side.strip().lower() if isinstance(side, str) else side # This line ignores case and spaces in the side.
+                q, p = number(q), number(p) # This line converts the quantity and price.
+                if sym in market_map and math.isnan(p): # This line checks if the order has no price.
+                    p = market_map[sym].price # This line trades at the market price.
+                if sym not in market_map or side not in ("buy", "sell") or not (math.isfinite(q) and q > 0) or not (math.isfinite(p) and p >= 0): # This line checks if the order is invalid on its own.
+                    failed.append(i) # This line rejects the order.
+                elif side == "buy" and c < q * p: # This line checks if there is not enough cash to buy.
+                    failed.append(i) # This line rejects the order.
+                elif side == "sell" and q > h.get(sym, 0): # This line checks if there is not enough to sell.
+                    failed.append(i) # This line rejects the order.
+                else: # This line handles an order that can be applied.
+                    c -= q * p if side == "buy" else -q * p # This line applies the change in cash.
+                    h[sym] = h.get(sym, 0) + (q if side == "buy" else -q) # This line applies the change in quantity.
+            if failed: # This line checks if the batch is rolled back.
+                rejected.extend(failed) # This line records the rejected orders.
+            else: # This line handles a batch that is applied.
+                cash, holdings = c, h # This line keeps the batch's state.
+        return cash, holdings, rejected # This line returns the final state and the rejected positions.
+    symbols = list(market_map) + ["ZZZ"] # This line lists the symbols to trade, including an unknown one.
+    bad_fields = {"side": ["hold", " BUY ", "Sell"], "qty": [0, -1, math.nan, math.inf, 1e12], "price": [-1.0, math.inf, math.nan]} # This line lists unusual values for each field, some of which are valid.
+    for trial in range(n_trials): # This line iterates over the trials.
+        orders = [] # This line initializes the orders of the trial.
+        for _ in range(rng.randint(1, 60)): # This line generates the orders.
+            order = {"symbol": rng.choice(symbols) if rng.random() < 0.1 else rng.choice(symbols[:-1]), "side": rng.choice(("buy", "sell")), "qty": rng.randint(1, 20), "price": round(rng.uniform(1, 100), 2)} # This line creates a normal order.
+            if rng.random() < 0.05: # This line occasionally makes a field unusual.
+                field = rng.choice(list(bad_fields)) # This line picks the field.
+                order[field] = rng.choice(bad_fields[field]) # This line replaces the value.
+            orders.append((order["symbol"], order["side"], order["qty"], order["price"])) # This line adds the order.
+        kind = ("tuples", "csv", "records")[trial % 3] # This line picks the input format.
+        batch_size = rng.choice((1, 7, 64)) # This line picks the batch size.
+        holdings = {s: rng.randint(0, 30) for s in rng.sample(symbols[:-1], 5)} # This line picks the starting quantities held.
+        cash = rng.uniform(0, 5_000) # This line picks the starting cash.
+        if kind == "csv": # This line checks if the orders are given as CSV text.
+            out = io.StringIO() # This line creates the CSV text.
+            csv.writer(out, lineterminator="\n").writerows([("symbol", "side", "qty", "price")] + [(s, d, q if rng.random() < 0.9 else repr(q), "" if isinstance(p, float) and math.isnan(p) else p) for s, d, q, p in orders]) # This line writes the orders, leaving a missing price empty.
+            source = io.StringIO(out.getvalue()) # This line replays the CSV text.
+        elif kind == "records": # This line checks if the orders are given as a numpy record array.
+            source = np.array(orders, dtype=OrderExecutor.ORDER_DTYPE) # This line stores the orders as a record array.
+        else: # This line handles a list of tuples.
+            source = orders # This line uses the orders as they are.
+        portfolio = Portfolio(cash, dict(holdings)) # This line creates the portfolio.
+        report = OrderExecutor(market_map, batch_size=batch_size).execute(portfolio, source) # This line runs the executor.
+        expected_cash, expected_holdings, expected_rejected = replay(cash, holdings, orders, batch_size) # This line replays the orders one at a time.
+        got = {s: q for s, q in portfolio.holdings.items() if q} # This line gets the executor's quantities held, leaving out zeros.
+        want = {s: q for s, q in expected_holdings.items() if q} # This line gets the replay's quantities held, leaving out zeros.
+        if [r[0] for r in report["rejections"]] != expected_rejected or got.keys() != want.keys() or not all(math.isclose(got[s], want[s]) for s in got) or not math.isclose(portfolio.cash_balance, expected_cash, rel_tol=1e-9, abs_tol=1e-6): # This line checks if the executor and the replay disagree.
+            raise AssertionError(f"Trial {trial} ({kind}, batch size {batch_size}) disagrees with the replay: rejected {[r[0] for r in report['rejections']]} instead of {expected_rejected}.") # This line raises an error describing the trial.
+    print(f"OrderExecutor matches the one-at-a-time replay on {n_trials} random trials.") # This line reports that every trial agreed.
+def benchmark_orders(n_orders=200_000, n_symbols=1_000): # This function compares the per-call buy and sell loop against the OrderExecutor.
+    rng = random.Random(0) # This line creates a seeded random generator, so every run replays the same orders.
+    market_map = MarketMap({f"S{i:04d}": CommonStock(f"S{i:04d}", rng.uniform(1, 500), dividend_yield=0.01) for i in range(n_symbols)}) # This line creates the market entities.
+    held, orders = {}, [] # This line initializes the generated quantities held and the list of orders.
+    for _ in range(n_orders): # This line generates the orders.
+        sym, q = f"S{rng.randrange(n_symbols):04d}", rng.randint(1, 10) # This line picks a symbol and a quantity.
+        side = "sell" if held.get(sym, 0) >= q and rng.random() < 0.4 else "buy" # This line only sells what has been bought, so every order is valid.
+        held[sym] = held.get(sym, 0) + (q if side == "buy" else -q) # This line keeps track of the quantity held.
+        orders.append((sym, side, q, market_map[sym].price)) # This line adds the order at the market price.
+    text = "symbol,side,qty,price\n" + "".join(f"{s},{d},{q},{p!r}\n" for s, d, q, p in orders) # This line writes the orders as CSV text.
+    records = np.array(orders, dtype=OrderExecutor.ORDER_DTYPE) # This line stores the orders as a numpy record array.
+    for kind in (Portfolio, PremiumPortfolio): # This line benchmarks both a plain and a tracking portfolio.
+        make = (lambda: Portfolio(1e12)) if kind is Portfolio else (lambda: PremiumPortfolio(1e12, market_map=market_map)) # This line defines how to create a fresh portfolio.
+        loop_pf = make() # This line creates the portfolio for the per-call loop.
+        start = time.perf_counter() # This line starts the timer.
+        for sym, side, q, _ in orders: # This line iterates over the orders one at a time.
+            try: # This line attempts the order.
+                (market_map[sym].buy if side == "buy" else market_map[sym].sell)(loop_pf, q) # This line buys or sells through Tradable.
+            except ValueError: # This line handles a rejected order.
+                pass # This line skips the order.
+        loop_rate = n_orders / (time.perf_counter() - start) # This line calculates the throughput of the loop.
+        csv_pf = make() # This line creates the portfolio for the per-call loop over the CSV text.
+        start = time.perf_counter() # This line starts the timer.
+        for sym, side, q, _ in OrderExecutor.read_orders(io.StringIO(text)): # This line reads the CSV orders one at a time.
+            try: # This line attempts the order.
+                (market_map[sym].buy if side == "buy" else market_map[sym].sell)(csv_pf, int(q)) # This line buys or sells through Tradable.
+            except ValueError: # This line handles a rejected order.
+                pass # This line skips the order.
+        csv_rate = n_orders / (time.perf_counter() - start) # This line calculates the throughput of the CSV loop.
+        print(f"{kind.__name__}: per-call loop {loop_rate:,.0f} orders/s, per-call loop over CSV {csv_rate:,.0f} orders/s") # This line prints the loop throughputs.
+        for label, source, baseline in (("tuples", lambda: iter(orders), loop_rate), ("csv", lambda: io.StringIO(text), csv_rate), ("records", lambda: records, loop_rate)): # This line iterates over the input formats and the loop each one is compared with.
+            pf = make() # This line creates a fresh portfolio.
+            report = OrderExecutor(market_map, batch_size=50_000).execute(pf, source()) # This line runs the executor.
+            assert not report["rejections"] and pf.view_positions() == loop_pf.view_positions() # This line checks that the executor ends with the same holdings as the loop.
+            print(f"  executor ({label}): {report['orders_per_sec']:,.0f} orders/s, {report['orders_per_sec'] / baseline:.1f}x") # This line prints the executor throughput and speedup.
+def benchmark_eod(n_portfolios=20_000, n_holdings=50, n_symbols=5_000): # This function compares the serial end-of-day loop against the EndOfDayRunner at different process counts.
+    rng = random.Random(0) # This line creates a seeded random generator, so every run uses the same portfolios.
+    market_map = MarketMap({f"S{i:04d}": (PreferredStock if i % 10 == 0 else CommonStock)(f"S{i:04d}", rng.uniform(1, 500), dividend_yield=rng.uniform(0, 0.05)) for i in range(n_symbols)}) # This line creates the market entities.
+    symbols = list(market_map) # This line lists the symbols to pick holdings from.
+    def make(): # This function creates the portfolios with the same holdings every time.
+        r = random.Random(1) # This line creates a seeded random generator for the holdings.
+        portfolios = [] # This line initializes the list of portfolios.
+        for _ in range(n_portfolios): # This line creates each portfolio.
+            p = PremiumPortfolio(initial_cash=r.uniform(0, 10_000)) # This line creates a portfolio with some cash.
+            p.holdings = {s: r.randint(1, 100) for s in r.sample(symbols, n_holdings)} # This line gives it random holdings.
+            portfolios.append(p) # This line adds it to the list.
+        return portfolios # This line returns the portfolios.
+    serial = make() # This line creates the portfolios for the serial loop.
+    start = time.perf_counter() # This line starts the timer.
+    with contextlib.redirect_stdout(io.StringIO()): # This line hides the messages printed by preferred dividend calculations.
+        expected = [(p.collect_dividends(market_map), p.total_value(market_map), p.risk_assessment(market_map)) for p in serial] # This line runs the three methods on every portfolio.
+    base = time.perf_counter() - start # This line records the serial time.
+    print(f"Serial methods: {base:.2f} s for {n_portfolios:,} portfolios") # This line prints the serial time.
+    cores = os.cpu_count() or 1 # This line gets the number of cores.
+    if cores < 4: # This line checks if there are fewer cores than the largest process count tried.
+        print(f"Only {cores} core(s) available: runs with more processes than cores share them, so they cannot show multi-core scaling.") # This line warns that the speedups below are not multi-core results.
+    for processes in sorted({1, 2, 4, cores}): # This line iterates over the process counts to try.
+        portfolios = make() # This line creates fresh portfolios.
+        with EndOfDayRunner(market_map, processes=processes) as runner: # This line creates the runner, which is released at the end of the block.
+            for day in (1, 2): # This line runs two days, the second reusing the holdings published on the first.
+                before = [p.cash_balance for p in portfolios] # This line records the cash balances before the run.
+                out = runner.run(portfolios) # This line runs the end-of-day calculations.
+                if day == 1: # This line checks if this is the first day.
+                    assert all(math.isclose(a.cash_balance, b.cash_balance) for a, b in zip(serial, portfolios)) and [e[2] for e in expected] == out["risk"] # This line checks the results against the serial loop.
+                else: # This line handles the second day.
+                    assert out["timings"]["reused"] and all(math.isclose(c, b + d) for c, b, d in zip(out["cash"], before, out["dividends"])) and [p.risk_assessment(market_map) for p in portfolios] == out["risk"] # This line checks that the holdings were reused, the dividends were added to the new cash balances, and the risk matches the new balances.
+                t = out["timings"] # This line gets the timings.
+                print(f"Runner, {processes} processes, day {day}: {t['total']:.3f} s (publish {t['publish']:.3f} s, compute {t['compute']:.3f} s), {base / t['total']:.1f}x") # This line prints the runner time, its parts, and the speedup.
+def benchmark_ui(n_symbols=20_000, seconds=5.0): # This function measures how late the Tk event loop runs while the app is under load, with and without the background thread.
+    rng = random.Random(0) # This line creates a seeded random generator, so every run uses the same market.
+    market_map = MarketMap({f"S{i:05d}": (PreferredStock if i % 10 == 0 else CommonStock)(f"S{i:05d}", rng.uniform(1, 500), dividend_yield=rng.uniform(0, 0.05)) for i in range(n_symbols)}) # This line creates the market entities.
+    for background in (False, True): # This line runs the benchmark with the work on the main thread and then on the background thread.
+        portfolio = PremiumPortfolio(initial_cash=1e9) # This line creates a portfolio without running totals, so every query is a full pass.
+        portfolio.holdings = {s: rng.randint(1, 100) for s in market_map} # This line holds every symbol in the market.
+        try: # This line attempts to create the window.
+            app = StockApp(market_map, portfolio, background=background) # This line creates the app.
+        except tk.TclError as e: # This line handles there being no display.
+            print(f"No display available ({e}); run this benchmark under a virtual display, e.g. xvfb-run.") # This line explains how to run the benchmark headless.
+            return # This line ends the benchmark.
+        app.withdraw() # This line hides the window, so the benchmark runs without showing anything.
+        lateness = [] # This line initializes how late each probe ran.
+        def probe(expected): # This function records how late it was called and schedules itself again.
+            now = time.perf_counter() # This line gets the current time.
+            lateness.append(now - expected) # This line records how late the probe ran.
+            app.after(10, probe, now + 0.010) # This line schedules the next probe in 10 ms.
+        def load(): # This function adds work the way a busy user would.
+            app._show_value() # This line asks for the total value.
+            app._show_risk() # This line asks for the risk assessment.
+            app._collect_dividends() # This line collects the dividends.
+            for i in range(200): # This line logs a burst of messages.
+                app._log(f"Load message {i}") # This line logs one message.
+            app.filter_text.set(f"S{rng.randrange(1000):03d}") # This line changes the symbol filter.
+            app.after(100, load) # This line adds more work in 100 ms.
+        app.after(10, probe, time.perf_counter() + 0.010) # This line starts the probes.
+        app.after(0, load) # This line starts the load.
+        app.after(int(seconds * 1000), app.quit) # This line stops the event loop after the benchmark time.
+        with contextlib.redirect_stdout(io.StringIO()): # This line hides the messages printed by preferred dividend calculations.
+            app.mainloop() # This line runs the event loop.
+        app._close() # This line stops the background thread and closes the window.
+        lateness.sort() # This line sorts the lateness values for the percentiles.
+        pct = lambda q: lateness[min(int(q * len(lateness)), len(lateness) - 1)] * 1e3 # This line returns a percentile of the lateness in milliseconds.
+        mode = "background thread" if background else "main thread" # This line names the mode.
+        print(f"Work on {mode}: {len(lateness)} probes, event-loop latency p50 {pct(0.5):.1f} ms, p99 {pct(0.99):.1f} ms, max {lateness[-1] * 1e3:.1f} ms") # This line prints the event-loop latency.
+def benchmark_feed(n_symbols=5_000, rate=100_000, seconds=5.0): # This function runs the market feed against a simulated exchange in another process.
+    market_map = MarketMap({f"S{i:04d}": CommonStock(f"S{i:04d}", 100.0, dividend_yield=0.01) for i in range(n_symbols)}) # This line creates the market entities.
+    portfolio = PremiumPortfolio(initial_cash=1e9, market_map=market_map) # This line creates a portfolio that keeps running totals.
+    for sym in market_map: # This line iterates over the symbols.
+        portfolio.add_position(sym, 10) # This line holds every symbol, so every tick revalues the portfolio.
+    path = os.path.join(tempfile.mkdtemp(), "exchange.sock") # This line picks a path for the simulator's socket.
+    sim = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--simulate-feed", "unix:" + path, str(n_symbols), str(rate), str(seconds)]) # This line starts the simulator process.
+    try: # This line makes sure the simulator is always stopped.
+        while not os.path.exists(path): # This line waits for the simulator to start listening.
+            time.sleep(0.05) # This line waits a little before checking again.
+        feed = MarketFeed(market_map) # This line creates the feed.
+        values = [] # This line initializes the portfolio values seen after each batch.
+        feed.subscribe(lambda updated: values.append(portfolio.total_value(market_map))) # This line revalues the portfolio after each batch.
+        stats = asyncio.run(feed.run("unix:" + path)) # This line runs the feed until the simulator closes the connection.
+    finally: # This line runs when the feed ends.
+        if sim.poll() is None: # This line checks if the simulator is still running, for example because the feed failed.
+            sim.kill() # This line stops the simulator.
+        sim.wait() # This line waits for the simulator to exit.
+    portfolio.verify_aggregates() # This line checks that the running totals followed every price change.
+    print(f"{stats['ticks']:,} ticks in {stats['seconds']:.1f} s: {stats['ticks_per_sec']:,.0f} ticks/s, {stats['updates']:,} updates in {stats['batches']:,} batches, {len(values):,} revaluations") # This line prints the throughput.
+    print("Tick-to-update latency (ms): " + ", ".join(f"{k} {v:.2f}" for k, v in stats["latency_ms"].items())) # This line prints the latency percentiles.
+def benchmark_memory(n=1_000_000): # This function reports the bytes per instrument of a security master stored as objects with a __dict__, slotted objects, and an InstrumentTable.
+    class DictMarketEntity: # This defines a copy of MarketEntity as it was before it was slotted, so the objects have a __dict__.
+        def __init__(self, symbol, price): # This is the constructor method that initializes the class.
+            self.symbol = symbol # This line sets the symbol.
+            self.price = price # This line sets the price.
+    class DictCommonStock(DictMarketEntity, Tradable, DividendPaying): # This defines a copy of CommonStock as it was before it was slotted, inheriting only empty mixins.
+        def __init__(self, symbol, price, dividend_yield=0.0): # This is the constructor method that initializes the class.
+            DictMarketEntity.__init__(self, symbol, price) # This line initializes the entity.
+            self.dividend_yield = dividend_yield # This line sets the dividend yield.
+    symbols = [sys.intern(f"S{i:07d}") for i in range(n)] # This line creates and interns the symbols first, so neither the strings nor the interning is counted below.
+    def measure(build): # This function returns the bytes allocated by a build function that stay allocated.
+        gc.collect() # This line clears garbage from earlier builds.
+        tracemalloc.start() # This line starts tracing memory.
+        kept = build() # This line builds the security master.
+        used = tracemalloc.get_traced_memory()[0] # This line gets the bytes still allocated.
+        tracemalloc.stop() # This line stops tracing memory.
+        del kept # This line frees the security master.
+        return used / n # This line returns the bytes per instrument.
+    results = { # This line measures each layout.
+        "dict objects": measure(lambda: {s: DictCommonStock(s, 100.0 + i, 0.01) for i, s in enumerate(symbols)}), # This line measures stocks with a __dict__.
+        "slotted objects": measure(lambda: {s: CommonStock(s, 100.0 + i, 0.01) for i, s in enumerate(symbols)}), # This line measures slotted stocks.
+        "instrument table": measure(lambda: InstrumentTable.from_market_map({s: CommonStock(s, 100.0 + i, 0.01) for i, s in enumerate(symbols)})), # This line measures a table, built from a market map that is freed afterwards.
+    } # Termination of the results dictionary.
+    for name, per in results.items(): # This line iterates over the layouts.
+        print(f"{name:>16}: {per:,.0f} bytes per instrument ({per * n / 2**20:,.0f} MiB for {n:,})") # This line prints the bytes per instrument.
 if __name__ == "__main__": # This line checks if the script is being run directly (not imported as a module).
-    market_map = { # This line initializes a dictionary to hold the market entities.
+    if "--check-orders" in sys.argv: # This line checks if the order executor check was requested on the command line.
+        check_orders() # This line runs the check.
+        sys.exit(0) # This line exits instead of opening the window.
+    if "--bench-orders" in sys.argv: # This line checks if the order benchmark was requested on the command line.
+        benchmark_orders() # This line runs the order benchmark.
+        sys.exit(0) # This line exits instead of opening the window.
+    if "--bench-eod" in sys.argv: # This line checks if the end-of-day benchmark was requested on the command line.
+        benchmark_eod() # This line runs the end-of-day benchmark.
+        sys.exit(0) # This line exits instead of opening the window.
+    if "--bench-ui" in sys.argv: # This line checks if the headless UI benchmark was requested on the command line.
+        benchmark_ui() # This line runs the UI benchmark.
+        sys.exit(0) # This line exits instead of opening the window.
+    if "--bench-feed" in sys.argv: # This line checks if the market feed benchmark was requested on the command line.
+        benchmark_feed() # This line runs the market feed benchmark.
+        sys.exit(0) # This line exits instead of opening the window.
+    if "--bench-memory" in sys.argv: # This line checks if the memory benchmark was requested on the command line.
+        benchmark_memory() # This line runs the memory benchmark.
+        sys.exit(0) # This line exits instead of opening the window.
+    if "--simulate-feed" in sys.argv: # This line checks if this process should stand in for the exchange.
+        address, n, rate, seconds = sys.argv[sys.argv.index("--simulate-feed") + 1:][:4] # This line reads the address, number of symbols, tick rate, and duration.
+        asyncio.run(simulate_exchange(address, [f"S{i:04d}" for i in range(int(n))], int(rate), float(seconds))) # This line serves ticks until the duration passes.
+        sys.exit(0) # This line exits instead of opening the window.
+    market_map = MarketMap({ # This line initializes a market map to hold the market entities.
         "AAPL": CommonStock("AAPL", 150.0, dividend_yield=0.006), # This line creates a CommonStock object for Apple Inc.
         "GOOG": CommonStock("GOOG", 2800.0, dividend_yield=0.0), # This line creates a CommonStock object for Alphabet Inc.
         "PREF": PreferredStock("PREF", 100.0, dividend_yield=0.05), # This line creates a PreferredStock object.
-    } # Termination point for the market_map dictionary.
-    portfolio = PremiumPortfolio(initial_cash=20_000.0) # This line creates a PremiumPortfolio object with an initial cash balance.
+    }) # Termination point for the market_map dictionary.
+    portfolio = PremiumPortfolio(initial_cash=20_000.0, market_map=market_map) # This line creates a PremiumPortfolio object with an initial cash balance, keeping running totals for the market map.
     app = StockApp(market_map, portfolio) # This line creates an instance of the StockApp class.
     app.geometry("800x500") # This line sets the size of the window.
     app.mainloop() # This line starts the main event loop of the tkinter application.
\ No newline at end of file
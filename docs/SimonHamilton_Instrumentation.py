@@ -0,0 +1,105 @@
+# This module adds opt-in instrumentation to the hot methods of both scripts, recording call counts and latency histograms.
+import importlib # This line imports importlib for finding the instrumented modules by name.
+import inspect # This line imports the inspect package for getting methods without unwrapping static methods.
+import time # This line imports the time package for measuring each call in nanoseconds.
+from functools import wraps # This line imports wraps, which keeps the name and docstring of a wrapped method.
+HOT_PATHS = ( # This line lists the methods instrumented by default, as (module, class, method) names.
+    ("SimonHamilton_Multiple_Inheritance", "CylinderOptimizer", "optimal_dimensions"), # This line names the scalar cylinder optimizer.
+    ("SimonHamilton_Multiple_Inheritance", "CylinderOptimizer", "optimal_dimensions_batch"), # This line names the batch cylinder optimizer.
+    ("SimonHamilton_Hybrid_Inheritance", "Tradable", "buy"), # This line names the buy method.
+    ("SimonHamilton_Hybrid_Inheritance", "Tradable", "sell"), # This line names the sell method.
+    ("SimonHamilton_Hybrid_Inheritance", "Portfolio", "collect_dividends"), # This line names the dividend collection method.
+    ("SimonHamilton_Hybrid_Inheritance", "AnalyticsMixin", "total_value"), # This line names the full-pass valuation method.
+    ("SimonHamilton_Hybrid_Inheritance", "PremiumPortfolio", "total_value"), # This line names the valuation method that can use running totals.
+    ("SimonHamilton_Hybrid_Inheritance", "PremiumPortfolio", "risk_assessment"), # This line names the risk assessment method.
+) # Termination of the HOT_PATHS tuple.
+class CallStats: # This defines a new class called CallStats that holds the count and latency histogram of one method.
+    __slots__ = ("calls", "total_ns", "min_ns", "max_ns", "buckets") # This line stores the fields in slots, since one is updated on every call.
+    def __init__(self): # This is the constructor method that initializes the class.
+        self.calls = 0 # This line initializes the number of calls.
+        self.total_ns = 0 # This line initializes the total time spent in the method.
+        self.min_ns = None # This line initializes the fastest call.
+        self.max_ns = 0 # This line initializes the slowest call.
+        self.buckets = [0] * 64 # This line initializes the histogram, where bucket b counts calls taking less than 2**b nanoseconds and at least half that.
+    def record(self, elapsed_ns): # This method adds one call to the statistics.
+        self.calls += 1 # This line counts the call.
+        self.total_ns += elapsed_ns # This line adds the time of the call.
+        if self.min_ns is None or elapsed_ns < self.min_ns: # This line checks if this is the fastest call.
+            self.min_ns = elapsed_ns # This line records the fastest call.
+        if elapsed_ns > self.max_ns: # This line checks if this is the slowest call.
+            self.max_ns = elapsed_ns # This line records the slowest call.
+        self.buckets[min(elapsed_ns.bit_length(), 63)] += 1 # This line adds the call to its power-of-two bucket.
+    def percentile(self, q): # This method estimates a latency percentile in nanoseconds from the histogram.
+        target = q * self.calls # This line gets how many calls are at or below the percentile.
+        seen = 0 # This line initializes the number of calls counted so far.
+        for b, count in enumerate(self.buckets): # This line iterates over the buckets from fastest to slowest.
+            seen += count # This line counts the calls in the bucket.
+            if count and seen >= target: # This line checks if the percentile falls in this bucket.
+                return min(2 ** b, self.max_ns) # This line returns the upper edge of the bucket, capped at the slowest call.
+        return 0 # This line returns zero when there were no calls.
+    def summary(self): # This method returns the statistics as a dictionary that can be written as JSON.
+        return { # This line returns the summary.
+            "calls": self.calls, # This line adds the number of calls.
+            "mean_us": self.total_ns / self.calls / 1e3 if self.calls else 0.0, # This line adds the mean latency.
+            "min_us": (self.min_ns or 0) / 1e3, # This line adds the fastest call.
+            "p50_us": self.percentile(0.5) / 1e3, # This line adds the estimated median.
+            "p99_us": self.percentile(0.99) / 1e3, # This line adds the estimated 99th percentile.
+            "max_us": self.max_ns / 1e3, # This line adds the slowest call.
+            "histogram": {f"<{2 ** b}ns": c for b, c in enumerate(self.buckets) if c}, # This line adds the non-empty buckets.
+        } # Termination of the summary dictionary.
+class Instrumentation: # This defines a new class called Instrumentation that wraps methods while enabled and puts the originals back when disabled.
+    _active = None # This line holds the instance that is enabled, since a second one would save the first one's wrappers as the originals.
+    def __init__(self, targets=HOT_PATHS): # This is the constructor method that initializes the class.
+        self.targets = targets # This line sets the methods to instrument.
+        self.stats = {} # This line initializes the statistics of each method, keyed by "Class.method".
+        self._originals = [] # This line holds what was replaced, so disabling leaves the classes exactly as they were.
+    def enable(self): # This method wraps every target method; nothing is wrapped until this is called, so there is no cost when instrumentation is off.
+        if self._originals: # This line checks if instrumentation is already on.
+            return self # This line leaves it on.
+        if Instrumentation._active is not None: # This line checks if another instance is enabled.
+            raise RuntimeError("Another Instrumentation is already enabled; disable it first.") # This line refuses to wrap the other instance's wrappers.
+        Instrumentation._active = self # This line records that this instance is enabled.
+        try: # This line makes sure a failure part way through leaves nothing wrapped.
+            for module_name, class_name, method_name in self.targets: # This line iterates over the target methods.
+                cls = getattr(importlib.import_module(module_name), class_name) # This line gets the class.
+                own = cls.__dict__.get(method_name) # This line gets the method if the class defines it itself, rather than inheriting it.
+                key = f"{class_name}.{method_name}" # This line names the statistics.
+                stats = self.stats.setdefault(key, CallStats()) # This line gets or creates the statistics.
+                setattr(cls, method_name, self._wrap(inspect.getattr_static(cls, method_name), stats)) # This line replaces the method with the timed wrapper.
+                self._originals.append((cls, method_name, own)) # This line records what to put back.
+        except BaseException: # This line handles a target that cannot be found or wrapped.
+            self.disable() # This line puts back the methods wrapped so far.
+            raise # This line passes the error on.
+        return self # This line returns the instrumentation, so it can be used in a with statement.
+    def disable(self): # This method puts back every original method.
+        for cls, method_name, own in reversed(self._originals): # This line iterates over the replaced methods in reverse.
+            if own is None: # This line checks if the method was inherited.
+                delattr(cls, method_name) # This line removes the wrapper so the inherited method is used again.
+            else: # This line handles a method the class defines itself.
+                setattr(cls, method_name, own) # This line puts back the original method.
+        self._originals = [] # This line records that instrumentation is off.
+        if Instrumentation._active is self: # This line checks if this instance was the enabled one.
+            Instrumentation._active = None # This line lets another instance be enabled.
+    def reset(self): # This method clears the statistics.
+        for stats in self.stats.values(): # This line iterates over the statistics.
+            stats.__init__() # This line clears the statistics in place.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _wrap(fn, stats): # This method returns a wrapper that times each call of a function.
+        clock = time.perf_counter_ns # This line looks up the clock once instead of on every call.
+        record = stats.record # This line looks up the record method once instead of on every call.
+        if isinstance(fn, staticmethod): # This line checks for a static method, which must stay static.
+            return staticmethod(Instrumentation._wrap(fn.__func__, stats)) # This line wraps the function inside it.
+        @wraps(fn) # This decorator copies the name and docstring of the function.
+        def timed(*args, **kwargs): # This function times one call.
+            start = clock() # This line starts the timer.
+            try: # This line makes sure the call is recorded even if it raises an error.
+                return fn(*args, **kwargs) # This line calls the original method.
+            finally: # This line runs after the call.
+                record(clock() - start) # This line records the time of the call.
+        return timed # This line returns the wrapper.
+    def report(self): # This method returns the statistics of every method that was called.
+        return {key: stats.summary() for key, stats in self.stats.items() if stats.calls} # This line returns the summaries.
+    def __enter__(self): # This method turns instrumentation on at the start of a with statement.
+        return self.enable() # This line enables the wrappers.
+    def __exit__(self, *exc): # This method turns instrumentation off at the end of a with statement.
+        self.disable() # This line puts back the original methods.
@@ -1,38 +1,296 @@
 # This code calculates the optimal dimensions of a cylinder (radius and height) that minimize the surface area for a given volume.
+import ast # This line imports the ast Python package for checking stored source code before it is compiled.
+import hashlib # This line imports the hashlib Python package for hashing expressions into cache keys.
+import inspect # This line imports the inspect Python package for reading the source of the methods a cached result depends on.
+import json # This line imports the json Python package for storing cache entries on disk.
+import keyword # This line imports the keyword Python package for rejecting stored argument names that are Python keywords.
 import math # This line imports the math Python package for mathematical operations.
-import sympy as sp # This line imports the sympy Python package for symbolic mathematics such as differentiation and solving equations.
+import os # This line imports the os Python package for working with the on-disk cache directory.
+import subprocess # This line imports the subprocess Python package for starting a fresh worker in the benchmark.
+import sys # This line imports the sys Python package for reading command line arguments.
+import tempfile # This line imports the tempfile Python package for writing cache files safely.
+import time # This line imports the time Python package for timing the benchmark.
+from collections import OrderedDict # This line imports OrderedDict, which keeps the in-memory cache in least recently used order.
+import numpy as np # This line imports the numpy Python package for evaluating many volumes at once.
+sp = None # This line holds the sympy Python package, which is only imported on a cache miss because importing it is slow.
+def _sympy(): # This function imports the sympy Python package the first time it is needed.
+    global sp # This line lets the function set the module-level sp name.
+    if sp is None: # This line checks if sympy has not been imported yet.
+        import sympy # This line imports the sympy Python package for symbolic mathematics such as differentiation and solving equations.
+        sp = sympy # This line keeps sympy so later calls do not import it again.
+    return sp # This line returns the sympy package.
+class ExprCache: # This defines a new class called ExprCache that memoizes symbolic results in memory and on disk.
+    VERSION = "1" # This line is part of every key, so changing the stored format makes old entries miss instead of breaking.
+    def __init__(self, directory=None, maxsize=256, persist=True): # This is the constructor method that initializes the class.
+        if directory is None: # This line checks if no cache directory was given.
+            directory = os.environ.get("SIMONHAMILTON_EXPR_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "simonhamilton_exprs") # This line uses the directory from the environment, or a default one in the home directory.
+        self.directory = directory # This line sets the directory that holds the on-disk tier.
+        self.maxsize = maxsize # This line sets how many entries the in-memory tier keeps.
+        self.persist = persist # This line sets whether entries are read from and written to disk.
+        self._memory = OrderedDict() # This line initializes the in-memory tier.
+        self.stats = {"memory": 0, "disk": 0, "miss": 0} # This line counts where each lookup was answered from.
+    @classmethod # This decorator indicates that the method receives the class instead of an instance.
+    def key(cls, kind, *parts): # This method builds a canonical key from the kind of operation and the text of its inputs.
+        text = "\0".join((cls.VERSION, kind) + parts) # This line joins the parts with a separator that cannot appear in them.
+        return hashlib.sha256(text.encode("utf-8")).hexdigest() # This line returns the hash of the joined text.
+    def lookup(self, key, compute, dump, load): # This method returns the cached value for a key, computing and storing it on a miss.
+        if key in self._memory: # This line checks the in-memory tier first.
+            self._memory.move_to_end(key) # This line marks the entry as the most recently used.
+            self.stats["memory"] += 1 # This line counts the memory hit.
+            return self._memory[key] # This line returns the value from memory.
+        payload = self._read(key) # This line checks the on-disk tier.
+        if payload is not None: # This line checks if the entry was found on disk.
+            try: # This line attempts to rebuild the value.
+                value = load(payload) # This line rebuilds the value from what was stored on disk.
+                self.stats["disk"] += 1 # This line counts the disk hit.
+            except (TypeError, ValueError, SyntaxError): # This line handles an entry that is damaged or contains code that is not allowed.
+                payload = None # This line treats the entry as a miss, so it is computed again and overwritten.
+        if payload is None: # This line handles a miss in both tiers.
+            value = compute() # This line computes the value, which is where sympy does its work.
+            self.stats["miss"] += 1 # This line counts the miss.
+            payload = dump(value) # This line turns the value into something that can be stored as JSON, or None if it cannot be stored.
+            if payload is not None: # This line checks if the value can be stored on disk.
+                self._write(key, payload) # This line stores the value on disk for later processes.
+        self._remember(key, value) # This line stores the value in memory.
+        return value # This line returns the value.
+    def clear(self): # This method empties the in-memory tier, leaving the disk tier alone.
+        self._memory.clear() # This line removes every entry from memory.
+    def _remember(self, key, value): # This method stores a value in the in-memory tier.
+        if self.maxsize <= 0: # This line checks if the in-memory tier is turned off.
+            return # This line skips storing the value.
+        self._memory[key] = value # This line stores the value.
+        if len(self._memory) > self.maxsize: # This line checks if the tier is over its size.
+            self._memory.popitem(last=False) # This line drops the least recently used entry.
+    def _path(self, key): # This method returns the file that holds a key on disk.
+        return os.path.join(self.directory, key + ".json") # This line joins the directory and the key.
+    def _read(self, key): # This method reads a payload from disk.
+        if not self.persist: # This line checks if the disk tier is turned off.
+            return None # This line reports a miss.
+        try: # This line attempts to read the file.
+            with open(self._path(key), encoding="utf-8") as f: # This line opens the file for the key.
+                return json.load(f) # This line returns the stored payload.
+        except (OSError, ValueError): # This line handles a missing or damaged file.
+            return None # This line reports a miss, so the value is simply computed again.
+    def _write(self, key, payload): # This method writes a payload to disk.
+        if not self.persist: # This line checks if the disk tier is turned off.
+            return # This line skips writing.
+        try: # This line attempts to write the file.
+            os.makedirs(self.directory, mode=0o700, exist_ok=True) # This line creates the cache directory if needed, readable and writable only by its owner.
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp") # This line creates a temporary file next to the final one.
+            with os.fdopen(fd, "w", encoding="utf-8") as f: # This line opens the temporary file for writing.
+                json.dump(payload, f) # This line writes the payload.
+            os.replace(tmp, self._path(key)) # This line moves the file into place in one step, so other processes never read half a file.
+        except OSError: # This line handles a cache directory that cannot be written.
+            pass # This line ignores the error, because the cache only saves time and the value was already computed.
+NUMERIC_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd) # This line lists the operators allowed in stored source code.
+def _numeric_attr(node): # This function returns the math or numpy constant or function named by a node, or None if it is not allowed.
+    if not (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and not node.attr.startswith("_")): # This line checks for a public attribute of a plain name, such as math.pi.
+        return None # This line rejects anything else.
+    if node.value.id == "math": # This line checks for the math package, whose functions only do arithmetic.
+        return getattr(math, node.attr, None) # This line returns the constant or function.
+    if node.value.id == "numpy": # This line checks for the numpy package, which also has functions that read and write files.
+        value = getattr(np, node.attr, None) # This line gets the attribute.
+        return value if isinstance(value, (float, np.ufunc)) else None # This line only allows constants and element-wise functions.
+    return None # This line rejects every other package.
+def _check_numeric(node, args): # This function raises ValueError unless a parsed expression only uses numbers, the arguments, arithmetic, and math or numpy functions.
+    if isinstance(node, ast.Expression): # This line checks for the top of the parsed expression.
+        return _check_numeric(node.body, args) # This line checks the expression itself.
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, complex): # This line checks for a number.
+        return # This line allows it.
+    if isinstance(node, ast.Name) and node.id in args: # This line checks for one of the arguments.
+        return # This line allows it.
+    if isinstance(node, ast.BinOp) and isinstance(node.op, NUMERIC_OPS): # This line checks for arithmetic on two values.
+        _check_numeric(node.left, args) # This line checks the left value.
+        return _check_numeric(node.right, args) # This line checks the right value.
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, NUMERIC_OPS): # This line checks for a sign in front of a value.
+        return _check_numeric(node.operand, args) # This line checks the value.
+    if _numeric_attr(node) is not None: # This line checks for a math or numpy constant or function.
+        return # This line allows it.
+    if isinstance(node, ast.Call) and not node.keywords and _numeric_attr(node.func) is not None: # This line checks for a call of a math or numpy function.
+        for arg in node.args: # This line iterates over the arguments of the call.
+            _check_numeric(arg, args) # This line checks the argument.
+        return # This line allows the call.
+    raise ValueError(f"Stored source contains {type(node).__name__}, which is not allowed.") # This line rejects everything else.
+def _numeric_fn(payload): # This function builds a numerical function from stored source code without using sympy.
+    args, body = payload # This line splits the payload into the argument names and the expression source.
+    if not all(isinstance(a, str) and a.isidentifier() and not keyword.iskeyword(a) and a not in ("math", "numpy") for a in args) or not isinstance(body, str): # This line checks that the argument names are plain names.
+        raise ValueError("Stored argument names are not allowed.") # This line rejects the payload.
+    tree = ast.parse(body, mode="eval") # This line parses the source without running it.
+    _check_numeric(tree, set(args)) # This line makes sure the source only does arithmetic, since the cache directory could have been written by someone else.
+    tree.body = ast.Lambda(ast.arguments(posonlyargs=[], args=[ast.arg(a) for a in args], kwonlyargs=[], kw_defaults=[], defaults=[]), tree.body) # This line turns the checked expression into a function of the arguments, without pasting text together.
+    fn = eval(compile(ast.fix_missing_locations(tree), "<expr cache>", "eval"), {"__builtins__": {}, "math": math, "numpy": np}) # This line compiles the function with only the math and numpy packages available.
+    fn.source = payload # This line keeps the source on the function so it can be stored on disk.
+    return fn # This line returns the function.
+SREPR_TEXT_CLASSES = ("Symbol", "Dummy", "Float", "Function") # This line lists the sympy classes whose first argument may be text in stored expressions.
+def _from_srepr(text): # This function rebuilds a sympy expression from its stored srepr text, allowing only sympy classes and constants.
+    sp = _sympy() # This line imports sympy.
+    def allowed(name): # This function checks if a name is a sympy expression class or constant.
+        value = getattr(sp, name, None) # This line gets the sympy object with the name.
+        return isinstance(value, sp.Basic) or (isinstance(value, type) and issubclass(value, sp.Basic)) # This line allows classes such as Symbol and constants such as pi.
+    tree = ast.parse(text, mode="eval") # This line parses the text without running it.
+    names = {id(n.args[0]) for n in ast.walk(tree) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id in SREPR_TEXT_CLASSES and n.args} # This line finds the text arguments that name a symbol or hold a number.
+    for node in ast.walk(tree): # This line iterates over every part of the parsed text.
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in names: # This line checks for any other text, which some sympy classes would turn into code.
+            raise ValueError("Stored expression contains text where it is not allowed.") # This line rejects the text.
+        if isinstance(node, ast.Name) and not allowed(node.id): # This line checks for a name that is not a sympy class or constant.
+            raise ValueError(f"Stored expression uses {node.id!r}, which is not allowed.") # This line rejects the text.
+        if not isinstance(node, (ast.Expression, ast.Call, ast.Name, ast.Load, ast.Constant, ast.keyword, ast.Tuple, ast.UnaryOp, ast.USub)): # This line checks for anything other than calls, names, and literals.
+            raise ValueError(f"Stored expression contains {type(node).__name__}, which is not allowed.") # This line rejects the text.
+    return eval(compile(tree, "<expr cache>", "eval"), {"__builtins__": {}}, {name: getattr(sp, name) for name in {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)}}) # This line builds the expression with only the names it uses.
 class FunctionOps: # This defines a new class called FunctionOps.
+    cache = ExprCache() # This line creates the cache shared by every FunctionOps method.
     @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
     def derivative(expr, var): # A new method defined as "derivative" that takes an expression and a variable.
-        return sp.diff(expr, var) # This line returns the derivative of the expression with respect to the variable.
+        sp = _sympy() # This line imports sympy, which is needed to hash the expression.
+        key = ExprCache.key("derivative", sp.srepr(expr), sp.srepr(var)) # This line builds the cache key from the expression and the variable.
+        return FunctionOps.cache.lookup(key, lambda: sp.diff(expr, var), sp.srepr, _from_srepr) # This line returns the derivative of the expression with respect to the variable.
     @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
     def solve_zero(expr, var): # A new method defined as "solve_zero" that takes an expression and a variable.
-        return sp.solve(sp.Eq(expr, 0), var) # This line returns the solutions to the equation where the expression equals zero.
+        sp = _sympy() # This line imports sympy, which is needed to hash the expression.
+        key = ExprCache.key("solve_zero", sp.srepr(expr), sp.srepr(var)) # This line builds the cache key from the expression and the variable.
+        return list(FunctionOps.cache.lookup( # This line returns the solutions to the equation where the expression equals zero, as a new list the caller may change.
+            key, # This line passes the cache key.
+            lambda: tuple(sp.solve(sp.Eq(expr, 0), var)), # This line solves the equation on a miss, keeping the solutions in a tuple so the cached value cannot be changed.
+            lambda sols: [sp.srepr(x) for x in sols], # This line stores each solution as text.
+            lambda payload: tuple(_from_srepr(x) for x in payload), # This line rebuilds each solution from its text, allowing only sympy classes and constants.
+        )) # Termination of the lookup call.
     @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
-    def to_numeric(expr, var): # A new method defined as "to_numeric" that takes an expression and a variable.
-        return sp.lambdify(var, expr, 'math') # This line converts the expression into a numerical function that can be evaluated.
+    def to_numeric(expr, var, module='math'): # A new method defined as "to_numeric" that takes an expression, a variable, and the numeric module to evaluate with.
+        sp = _sympy() # This line imports sympy, which is needed to hash and print the expression.
+        key = ExprCache.key("to_numeric", sp.srepr(expr), sp.srepr(var), module) # This line builds the cache key from the expression, the variable, and the module.
+        return FunctionOps.cache.lookup(key, lambda: FunctionOps._compile(expr, var, module), lambda fn: getattr(fn, "source", None), _numeric_fn) # This line returns the expression as a numerical function that can be evaluated.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _compile(expr, var, module): # This method converts an expression into a numerical function whose source can be stored on disk.
+        sp = _sympy() # This line imports sympy.
+        from sympy.printing.numpy import NumPyPrinter # This line imports the printer that writes numpy code.
+        from sympy.printing.pycode import PythonCodePrinter # This line imports the printer that writes math code.
+        variables = list(var) if isinstance(var, (list, tuple)) else [var] # This line accepts either one variable or a list of them.
+        args = [str(v) for v in variables] # This line gets the variable names.
+        printer = {"math": PythonCodePrinter, "numpy": NumPyPrinter}.get(module) # This line picks the printer for the module.
+        if printer is None or not all(a.isidentifier() for a in args): # This line checks if the source cannot be written for this module or these names.
+            return sp.lambdify(var, expr, module) # This line falls back to lambdify, which is cached in memory only.
+        printer = printer() # This line creates the printer.
+        body = printer.doprint(expr) # This line writes the expression as source code.
+        if printer._not_supported: # This line checks if part of the expression could not be written.
+            return sp.lambdify(var, expr, module) # This line falls back to lambdify, which is cached in memory only.
+        return _numeric_fn((args, body)) # This line compiles the source into a function.
 class Cylinder: # This defines a new class called Cylinder.
+    SURFACE_AREA = "2*pi*r**2 + 2*V/r" # This line defines the surface area S of the cylinder in terms of its radius r and volume V, as text so it can also be hashed without sympy.
     def __init__(self): # This is the constructor method that initializes the class.
-        self.r, self.V = sp.symbols('r V', positive=True, real=True) # This line creates symbolic variables r and V, which are positive and real.
-        self.S = 2 * sp.pi * self.r**2 + 2 * self.V / self.r # This line defines the surface area S of the cylinder in terms of its radius r and volume V.
+        self._symbolic = None # This line holds the symbols and the surface area expression, which are only built when sympy is needed.
+    def _build_symbolic(self): # This method builds the symbols and the surface area expression the first time they are used.
+        if self._symbolic is None: # This line checks if they have not been built yet.
+            sp = _sympy() # This line imports sympy.
+            r, V = sp.symbols('r V', positive=True, real=True) # This line creates symbolic variables r and V, which are positive and real.
+            S = sp.sympify(self.SURFACE_AREA, locals={"r": r, "V": V}) # This line turns the surface area text into an expression.
+            self._symbolic = (r, V, S) # This line keeps the symbols and the expression.
+        return self._symbolic # This line returns the symbols and the expression.
+    @property # This decorator makes r read like an attribute.
+    def r(self): # This method returns the radius symbol.
+        return self._build_symbolic()[0] # This line returns the radius symbol.
+    @property # This decorator makes V read like an attribute.
+    def V(self): # This method returns the volume symbol.
+        return self._build_symbolic()[1] # This line returns the volume symbol.
+    @property # This decorator makes S read like an attribute.
+    def S(self): # This method returns the surface area expression.
+        return self._build_symbolic()[2] # This line returns the surface area expression.
     def surface_area_expr(self): # This method returns the symbolic expression for the surface area.
         return self.S # This line returns the surface area expression.
     def height_expr(self, radius): # This method calculates the height of the cylinder given its radius.
-        return self.V / (sp.pi * radius**2) # This line returns the height of the cylinder in terms of its volume and radius.
+        return self.V / (_sympy().pi * radius**2) # This line returns the height of the cylinder in terms of its volume and radius.
 class CylinderOptimizer(FunctionOps, Cylinder): # This defines a new class called CylinderOptimizer that inherits from FunctionOps and Cylinder, demonstrating multiple inheritance.
     def __init__(self): # This is the constructor method that initializes the class.
         Cylinder.__init__(self) # This line initializes the Cylinder class.
-    def optimal_dimensions(self, volume_value): # This method calculates the optimal dimensions of the cylinder for a given volume.
+        self._batch_fns = None # This line holds the numpy functions for batch mode once they have been compiled.
+    def _optimum_exprs(self): # This method builds the symbolic expressions for the optimal radius, height, and minimal surface area.
         dS_dr = self.derivative(self.S, self.r) # This line calculates the derivative of the surface area with respect to the radius.
         r_solutions = self.solve_zero(dS_dr, self.r) # This line finds the radius that minimizes the surface area by solving the equation where the derivative equals zero.
         r_opt = r_solutions[0] # This line selects the first solution as the optimal radius.
         h_opt_expr = self.height_expr(r_opt) # This line calculates the optimal height using the optimal radius.
         S_min_expr  = self.S.subs(self.r, r_opt) # This line calculates the minimum surface area by substituting the optimal radius into the surface area expression.
-        r_fn = self.to_numeric(r_opt, self.V) # This line converts the optimal radius expression into a numerical function.
-        h_fn = self.to_numeric(h_opt_expr, self.V) # This line converts the optimal height expression into a numerical function.
-        S_fn = self.to_numeric(S_min_expr, self.V) # This line converts the minimum surface area expression into a numerical function.
+        return r_opt, h_opt_expr, S_min_expr # This line returns the three symbolic expressions in terms of the volume.
+    PIPELINE = ("_build_symbolic", "height_expr", "_optimum_exprs", "derivative", "solve_zero", "to_numeric", "_compile") # This line names the methods whose code the cached functions depend on.
+    _fingerprints = {} # This line holds the fingerprint of each class, since reading source is slow.
+    @classmethod # This decorator indicates that the method receives the class instead of an instance.
+    def _code_fingerprint(cls): # This method returns a hash of the source of the pipeline methods, so editing any of them makes old cache entries miss.
+        if cls not in cls._fingerprints: # This line checks if the fingerprint of the class has not been computed yet.
+            digest = hashlib.sha256() # This line creates the hash.
+            for name in cls.PIPELINE: # This line iterates over the pipeline methods.
+                fn = inspect.unwrap(getattr(cls, name)) # This line gets the method as the class resolves it, so an override in a subclass counts.
+                try: # This line attempts to read the source.
+                    text = inspect.getsource(fn) # This line reads the source of the method.
+                except (OSError, TypeError): # This line handles a method whose source file is not available.
+                    text = repr(fn.__code__.co_code) + repr(fn.__code__.co_consts) # This line uses the compiled code instead.
+                digest.update(name.encode("utf-8") + b"\0" + text.encode("utf-8") + b"\0") # This line adds the method to the hash.
+            cls._fingerprints[cls] = digest.hexdigest() # This line keeps the fingerprint.
+        return cls._fingerprints[cls] # This line returns the fingerprint.
+    def _numeric_fns(self, module): # This method returns the radius, height, and surface area functions, using the cache so sympy only runs on a miss.
+        key = ExprCache.key("cylinder_optimum", type(self).__name__, self.SURFACE_AREA, module, self._code_fingerprint()) # This line builds the cache key from the surface area text and the code of the pipeline, so it can be built without sympy and changes whenever that code does.
+        def compute(): # This function runs the symbolic pipeline on a miss.
+            return tuple(self.to_numeric(e, self.V, module) for e in self._optimum_exprs()) # This line converts each expression into a numerical function.
+        def dump(fns): # This function turns the functions into their stored source.
+            sources = [getattr(fn, "source", None) for fn in fns] # This line gets the source of each function.
+            return None if None in sources else sources # This line only stores the functions if all of them have source.
+        return self.cache.lookup(key, compute, dump, lambda payload: tuple(_numeric_fn(p) for p in payload)) # This line returns the three functions.
+    def optimal_dimensions(self, volume_value): # This method calculates the optimal dimensions of the cylinder for a given volume.
+        r_fn, h_fn, S_fn = self._numeric_fns('math') # This line gets the numerical functions for the optimal radius, height, and minimum surface area.
         return r_fn(volume_value), h_fn(volume_value), S_fn(volume_value) # This line returns the optimal radius, height, and minimum surface area as numerical values for the given volume.
+    def _compile_batch(self): # This method compiles the symbolic pipeline into numpy functions, only the first time it is needed.
+        if self._batch_fns is None: # This line checks if the pipeline has not been compiled yet for this optimizer.
+            self._batch_fns = self._numeric_fns('numpy') # This line gets the numpy functions and keeps them on the optimizer.
+        return self._batch_fns # This line returns the compiled radius, height, and surface area functions.
+    def optimal_dimensions_batch(self, volumes): # This method calculates the optimal dimensions for a numpy array or any other iterable of volumes.
+        try: # This line attempts to read the volumes as an array, which works for numpy arrays, lists, and single numbers.
+            V_arr = np.asarray(volumes, dtype=float) # This line makes sure the volumes are a numpy array of floats.
+        except TypeError: # This line handles a generator or another iterable that numpy cannot read directly.
+            V_arr = np.fromiter(volumes, dtype=float) # This line reads the iterable straight into a numpy array.
+        r_fn, h_fn, S_fn = self._compile_batch() # This line gets the compiled numpy functions.
+        shape = V_arr.shape # This line remembers the shape so every result array has the same shape as the input.
+        return tuple(self._batch_result(fn(V_arr), shape) for fn in (r_fn, h_fn, S_fn)) # This line returns the optimal radius, height, and minimal surface area for every volume.
+    @staticmethod # This decorator indicates that the method can be called on the class itself, not just on instances of the class.
+    def _batch_result(value, shape): # This method turns the output of a numpy function into a writable array with the shape of the input.
+        out = np.asarray(value, dtype=float) # This line makes sure the output is a numpy array of floats.
+        if out.shape != shape: # This line checks if the function returned one number instead of an array, which happens when the expression does not depend on the volume.
+            out = np.broadcast_to(out, shape).copy() # This line repeats the number for every volume, copying so the result can be written to.
+        return out # This line returns the array.
+def benchmark(n_loop=200, n_batch=1_000_000): # This function compares the per-call loop against the batch mode and the expression cache.
+    shared_cache = FunctionOps.cache # This line keeps the shared cache so it can be put back after the uncached loop.
+    FunctionOps.cache = ExprCache(maxsize=0, persist=False) # This line turns both cache tiers off, so the loop pays the full symbolic cost on every call.
+    optimizer = CylinderOptimizer() # This line creates an optimizer to benchmark.
+    volumes = np.linspace(1.0, 1000.0, n_batch) # This line creates the volumes to size.
+    start = time.perf_counter() # This line starts the timer for the per-call loop.
+    for v in volumes[:n_loop]: # This line loops over a sample of the volumes, since the loop is too slow for all of them.
+        optimizer.optimal_dimensions(float(v)) # This line sizes one container without any caching.
+    loop_per = (time.perf_counter() - start) / n_loop # This line calculates the time per volume for the loop.
+    FunctionOps.cache = shared_cache # This line puts the shared cache back.
+    optimizer.optimal_dimensions(1.0) # This line warms the cache, so the loop below only measures hits.
+    start = time.perf_counter() # This line starts the timer for the cached per-call loop.
+    for v in volumes[:n_loop]: # This line loops over the same sample of volumes.
+        optimizer.optimal_dimensions(float(v)) # This line sizes one container, which is answered from the cache.
+    cached_per = (time.perf_counter() - start) / n_loop # This line calculates the time per volume for the cached loop.
+    start = time.perf_counter() # This line starts the timer for the first batch call, which includes compiling.
+    r_arr, h_arr, S_arr = optimizer.optimal_dimensions_batch(volumes) # This line sizes every container at once.
+    cold = time.perf_counter() - start # This line records the time for the first batch call.
+    start = time.perf_counter() # This line starts the timer for a second batch call, which reuses the compiled functions.
+    optimizer.optimal_dimensions_batch(volumes) # This line sizes every container again.
+    warm = time.perf_counter() - start # This line records the time for the second batch call.
+    r_ref, h_ref, S_ref = optimizer.optimal_dimensions(float(volumes[-1])) # This line computes the last volume with the scalar method to check the results.
+    assert math.isclose(r_arr[-1], r_ref) and math.isclose(h_arr[-1], h_ref) and math.isclose(S_arr[-1], S_ref) # This line checks that both methods agree.
+    worker = ( # This line is the code run by a fresh worker process, which reads the warm disk cache.
+        "import sys, time; t = time.perf_counter(); import SimonHamilton_Multiple_Inheritance as m; " # This line imports the module and starts the timer.
+        "print(m.CylinderOptimizer().optimal_dimensions(10.0)[0], time.perf_counter() - t, 'sympy' in sys.modules)" # This line sizes one container and reports whether sympy was imported.
+    ) # Termination of the worker code.
+    out = subprocess.run([sys.executable, "-c", worker], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.split() # This line runs the worker and splits its output.
+    print(f"Per-call loop (no cache): {loop_per * 1e6:,.1f} us per volume ({n_loop} volumes)") # This line prints the uncached loop timing.
+    print(f"Per-call loop (cached):   {cached_per * 1e6:,.1f} us per volume ({n_loop} volumes)") # This line prints the cached loop timing.
+    print(f"Batch (cold):  {cold / n_batch * 1e6:,.4f} us per volume ({n_batch:,} volumes, {cold:.3f} s)") # This line prints the first batch timing.
+    print(f"Batch (warm):  {warm / n_batch * 1e6:,.4f} us per volume ({n_batch:,} volumes, {warm:.3f} s)") # This line prints the second batch timing.
+    print(f"Speedup (warm): {loop_per / (warm / n_batch):,.0f}x") # This line prints how much faster the batch mode is than the uncached loop.
+    print(f"Fresh worker with warm disk cache: {float(out[1]) * 1e3:,.1f} ms to first result, sympy imported: {out[2]}") # This line prints the fresh worker timing and whether it needed sympy.
 if __name__ == "__main__": # This line checks if the script is being run directly (not imported as a module).
+    if "--bench" in sys.argv: # This line checks if the benchmark was requested on the command line.
+        benchmark() # This line runs the benchmark.
+        sys.exit(0) # This line exits after the benchmark instead of asking for a volume.
     V = float(input("Enter a constant volume: ")) # This line prompts the user to enter a volume and converts it to a float.
     optimizer = CylinderOptimizer() # This line creates an instance of the CylinderOptimizer class.
     r_opt, h_opt, S_min = optimizer.optimal_dimensions(V) # This line calls the optimal_dimensions method to calculate the optimal dimensions for the given volume.